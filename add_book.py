@@ -1,26 +1,27 @@
 import tkinter as tk
 from tkinter import ttk, END
-from ttkbootstrap import Style
-from PIL import Image, ImageTk
-import sqlite3
+import theme
 from tkinter import filedialog
-import os
 from tkinter.messagebox import showerror, showinfo
-import admin_dashboard
+from navigation import navigator
+from background import db_tasks
+from database import repository
+from thumbnails import thumbnail_service
+import cover_store
+from cover_store import DEFAULT_IMAGE
+
+COVER_SIZE = (250, 375)
 
 class addBook(tk.Toplevel):
     def __init__(self, username):
         super().__init__()
 
         self.file_path = ""
-        style = Style(theme='united')
-        style.master = self
+        self.cover_future = None
+        theme.get_style()
 
         self.username = username
 
-        self.con = sqlite3.connect('library.db')
-        self.cur = self.con.cursor()
-
         self.book_name_str = tk.StringVar()
         self.book_author_str = tk.StringVar()
         self.book_genre_str = tk.StringVar()
@@ -28,7 +29,7 @@ class addBook(tk.Toplevel):
         self.page_count_str = tk.StringVar()
 
 
-        self.image = self.load_and_resize_image("default_image.png", (250, 375))
+        self.image = None
 
         screen_width = self.winfo_screenwidth()
         screen_height = self.winfo_screenheight()
@@ -37,7 +38,6 @@ class addBook(tk.Toplevel):
         x = (screen_width - width) // 2
         y = (screen_height - height) // 2 - 200
         self.geometry(f"{width}x{height}+{x}+{y}")
-        style.configure('Medium.TButton', font=('inconsolata', 13))
         
         self.title("Add Book")
         self.resizable(False, False)
@@ -48,24 +48,23 @@ class addBook(tk.Toplevel):
         self.creating_widgets()
         self.packing_widgets()
         self.image_widgets()
+        self.show_cover(DEFAULT_IMAGE)
 
+    def show_cover(self, filepath):
+        thumbnail_service.request(self, filepath, COVER_SIZE, self.set_cover)
 
-        self.mainloop()
+    def set_cover(self, photo):
+        self.image = photo
+        self.book_cover.config(image= self.image)
 
-    def load_and_resize_image(self, filepath, size):
-        pil_image = Image.open(filepath)
-        pil_image = pil_image.resize(size, Image.LANCZOS)
-        return ImageTk.PhotoImage(pil_image)
-    
     def select_file(self, event):
         self.file_path = filedialog.askopenfilename(filetypes=[("Image Files", "*.png")])
         if self.file_path:
-            self.file = os.path.basename(self.file_path)
-            self.image = self.load_and_resize_image(f"{self.file}", (250, 375))
-            self.image_widgets()
+            self.cover_future = cover_store.ingest_async(self.file_path)
+            self.show_cover(self.file_path)
 
     def image_widgets(self):
-        self.book_cover = ttk.Label(self, image= self.image)
+        self.book_cover = ttk.Label(self, text= "Loading cover...", width= 30)
         self.book_cover.bind("<Button-1>", self.select_file)
         self.book_cover.grid(row = 0, column= 0, padx= 10, pady= 10)
 
@@ -92,9 +91,9 @@ class addBook(tk.Toplevel):
         self.book_page_count = ttk.Label(self.right_frame, text= "Enter the book page count: ", font= "inconsolata 15")
         self.book_page_count_entry = ttk.Entry(self.right_frame, textvariable= self.page_count_str)
 
-        self.add_button = ttk.Button(self.right_frame, text= "Click to add!", command= self.addbook_clicked, style="Medium.TButton")
+        self.add_button = ttk.Button(self.right_frame, text= "Click to add!", command= self.addbook_clicked, style="Small.TButton")
 
-        self.previous_menu_button = ttk.Button(self.right_frame, text = "Previous Menu", command= self.previous_menu, style="Medium.TButton")
+        self.previous_menu_button = ttk.Button(self.right_frame, text = "Previous Menu", command= self.previous_menu, style="Small.TButton")
     def packing_widgets(self):
         self.right_frame.grid(row = 0, column= 1)
         self.biglabel.grid(row = 0, column= 0, columnspan= 2, pady= 20)
@@ -118,21 +117,31 @@ class addBook(tk.Toplevel):
         book_language = self.book_language_str.get()
         book_page_count = self.page_count_str.get()
         if book_title and book_author and book_genre and book_language and book_page_count and self.file_path != "":
-            self.cur.execute('INSERT INTO book_properties (image_path, title, author, genre, language, page, is_taken, who_took, email) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)', (self.file, book_title, book_author, book_genre, book_language, book_page_count, "False", "In the Stock!", "-"))
-            self.con.commit()
-            showerror(message= "Book has been added to the database!")
-            self.book_name_entry.delete(0, END)
-            self.book_author_entry.delete(0, END)
-            self.book_genre_entry.delete(0, END)
-            self.book_language_entry.delete(0, END)
-            self.book_page_count_entry.delete(0, END)
-            self.image = self.load_and_resize_image("default_image.png", (250, 375))
-            self.image_widgets()
+            cover_future = self.cover_future
+            self.add_button.config(state= "disabled")
+            db_tasks.run(self, lambda: repository.add_book(cover_future.result(), book_title, book_author, book_genre, book_language, book_page_count),
+                         self.book_added, self.add_failed, cancellable= False)
         else:
             showerror(message= "Please enter all the field and put an image!")
         
+    def book_added(self, _):
+        self.add_button.config(state= "normal")
+        showerror(message= "Book has been added to the database!")
+        self.book_name_entry.delete(0, END)
+        self.book_author_entry.delete(0, END)
+        self.book_genre_entry.delete(0, END)
+        self.book_language_entry.delete(0, END)
+        self.book_page_count_entry.delete(0, END)
+        self.file_path = ""
+        self.cover_future = None
+        self.show_cover(DEFAULT_IMAGE)
+
+    def add_failed(self, error):
+        self.add_button.config(state= "normal")
+        if isinstance(error, OSError):
+            showerror(message= "The selected cover could not be read as an image!")
+        else:
+            showerror(message= f"The book could not be added: {error}")
+
     def previous_menu(self):
-        self.withdraw() 
-        add_book_window = admin_dashboard.adminDashboard(self.username)
-        add_book_window.wait_window()
-        self.deiconify()
\ No newline at end of file
+        navigator.back()
\ No newline at end of file
@@ -1,21 +1,16 @@
 import tkinter as tk
 from tkinter import ttk, END
-from ttkbootstrap import Style
-import sqlite3
+import theme
 from tkinter.messagebox import showerror, showinfo
 from datetime import datetime
-import add_book
-import all_books
-import login_screen
-import request_book_back
+from navigation import navigator
+from profiling import profiler
 
 class adminDashboard(tk.Toplevel):
     def __init__(self, username):
         super().__init__()
 
-        style = Style(theme='united')
-        style.master = self
-        style.configure('Medium.TButton', font=('inconsolata', 18))
+        theme.get_style()
 
         today = datetime.now()
         self.formatted_date = today.strftime("%B %-d, %Y.")
@@ -25,7 +20,7 @@ class adminDashboard(tk.Toplevel):
         screen_width = self.winfo_screenwidth()
         screen_height = self.winfo_screenheight()
         width = 500
-        height = 300
+        height = 420 if profiler.enabled else 360
         x = (screen_width - width) // 2
         y = (screen_height - height) // 2 - 200
         self.geometry(f"{width}x{height}+{x}+{y}")
@@ -33,21 +28,21 @@ class adminDashboard(tk.Toplevel):
         self.title("Admin Dashboard")
 
         self.columnconfigure(0, weight=1)
-        self.rowconfigure((0, 1, 2, 3, 4, 5), weight=1)
+        self.rowconfigure((0, 1, 2, 3, 4, 5, 6, 7), weight=1)
 
         self.creating_widgets()
         self.packing_widgets()
 
-        self.mainloop()
-
     def creating_widgets(self):
         self.top_label = ttk.Label(self, text=f"Welcome {self.username}!", font="inconsolata 25")
         self.below_label = ttk.Label(self, text=f"It is currently: {self.formatted_date}", font="inconsolata 14")
 
-        self.add_book_button = ttk.Button(self, text="Add Book to Library", style="Medium.TButton", command= self.add_book)
-        self.request_book_button = ttk.Button(self, text="Request A Book Back", style="Medium.TButton", command= self.request_book)
-        self.all_book_button = ttk.Button(self, text="All Books in the Library", style="Medium.TButton", command= self.all_books)
-        self.go_back_button = ttk.Button(self, text= "Log Out!", style="Medium.TButton", command= self.previous_menu)
+        self.add_book_button = ttk.Button(self, text="Add Book to Library", style="Large.TButton", command= self.add_book)
+        self.request_book_button = ttk.Button(self, text="Request A Book Back", style="Large.TButton", command= self.request_book)
+        self.all_book_button = ttk.Button(self, text="All Books in the Library", style="Large.TButton", command= self.all_books)
+        self.manage_loans_button = ttk.Button(self, text="Manage Loans", style="Large.TButton", command= self.manage_loans)
+        self.stats_button = ttk.Button(self, text="Performance Stats", style="Large.TButton", command= self.stats)
+        self.go_back_button = ttk.Button(self, text= "Log Out!", style="Large.TButton", command= self.previous_menu)
 
 
     def packing_widgets(self):
@@ -56,29 +51,27 @@ class adminDashboard(tk.Toplevel):
         self.add_book_button.grid(row=2, column=0, sticky="nsew", padx=10, pady=10)
         self.request_book_button.grid(row=3, column=0, sticky="nsew", padx=10, pady=10)
         self.all_book_button.grid(row=4, column=0, sticky="nsew", padx=10, pady=10)
-        self.go_back_button.grid(row=5, column=0, sticky="nsew", padx=10, pady=10)
+        self.manage_loans_button.grid(row=5, column=0, sticky="nsew", padx=10, pady=10)
+        # Only offered when the app was started with profiling switched on.
+        if profiler.enabled:
+            self.stats_button.grid(row=6, column=0, sticky="nsew", padx=10, pady=10)
+        self.go_back_button.grid(row=7, column=0, sticky="nsew", padx=10, pady=10)
 
 
     def add_book(self):
-        self.withdraw() 
-        add_book_window = add_book.addBook(self.username)
-        add_book_window.wait_window()
-        self.deiconify()
+        navigator.push("add_book", self.username)
 
     def request_book(self):
-        self.withdraw() 
-        add_book_window = request_book_back.RequestBookBack(self.username)
-        add_book_window.wait_window()
-        self.deiconify()
+        navigator.push("request_book_back", self.username)
 
     def all_books(self):
-        self.withdraw() 
-        add_book_window = all_books.AllBooks("admin", self.username)
-        add_book_window.wait_window()
-        self.deiconify()
+        navigator.push("all_books", "admin", self.username)
+
+    def manage_loans(self):
+        navigator.push("manage_loans", self.username)
+
+    def stats(self):
+        navigator.push("profiler_stats", self.username)
 
     def previous_menu(self):
-        self.withdraw() 
-        add_book_window = login_screen.LoginScreen()
-        add_book_window.wait_window()
-        self.deiconify()
\ No newline at end of file
+        navigator.log_out()
\ No newline at end of file
@@ -1,94 +1,300 @@
+import re
 import tkinter as tk
 from tkinter import ttk
-import sqlite3
-import user_dashboard
-import admin_dashboard
-from ttkbootstrap import Style
+from database import repository, sort_key
+from navigation import navigator
+from change_feed import LiveScreen, change_feed
+from background import db_tasks
 
+PAGE_SIZE = 100
+WINDOW_ROWS = 300
+EDGE_THRESHOLD = 0.05
+SEARCH_DELAY_MS = 250
+CHUNK_ROWS = 25
+# (heading, Book field, width) of each column.
+COLUMNS = (("Title", "title", 350), ("Author", "author", 120), ("Genre", "genre", 100), ("Language", "language", 100),
+           ("Page Count", "page", 80), ("Is Taken?", "is_taken", 70), ("Who Took?", "who_took", 150), ("E-Mail", "email", 300))
+PAGE_FILTER = re.compile(r"(<=|>=|<|>|=)?\s*(\d+)")
 
-class AllBooks(tk.Toplevel):
+
+# "300", "<300", ">=100" or "100-300" as (operator, pages) conditions; None
+# when the text is none of these.
+def page_filter(text):
+    low, dash, high = text.partition("-")
+    if dash:
+        if low.strip().isdigit() and high.strip().isdigit():
+            return ((">=", int(low)), ("<=", int(high)))
+        return None
+    match = PAGE_FILTER.fullmatch(text)
+    if match is None:
+        return None
+    return ((match.group(1) or "=", int(match.group(2))),)
+
+
+class AllBooks(LiveScreen, tk.Toplevel):
     def __init__(self, location, username):
         super().__init__()
  
-        self.books = []
+        self.loading_page = False
+        self.query = ""
+        self.filters = ()
+        self.sort_column = None
+        self.sort_descending = False
+        self.sort_keys = {}
+        self.filter_vars = {}
+        self.filter_widgets = {}
+        self.search_job = None
+        self.load_task = None
+        self.insert_job = None
+        self.search_str = tk.StringVar()
         self.location = location
         self.username = username
         
         screen_width = self.winfo_screenwidth()
         screen_height = self.winfo_screenheight()
         width = 1300
-        height = 500
+        height = 530
         x = (screen_width - width) // 2
         y = (screen_height - height) // 2 - 100
         self.geometry(f"{width}x{height}+{x}+{y}")
         self.title("All Books in the Kamweru Library!")
         self.resizable(False, False)
 
-        self.rowconfigure(0, weight=9)
+        self.rowconfigure(0, weight=1)
         self.rowconfigure(1, weight=1)
+        self.rowconfigure(2, weight=9)
+        self.rowconfigure(3, weight=1)
         self.columnconfigure(0, weight=1)
 
+        self.search_frame = ttk.Frame(self)
+        self.search_frame.grid(row=0, column=0, sticky="ew", padx=10, pady=5)
+        self.filter_frame = ttk.Frame(self)
+        self.filter_frame.grid(row=1, column=0, sticky="ew")
         self.table_frame = ttk.Frame(self)
-        self.table_frame.grid(row=0, column=0, sticky="nsew")
+        self.table_frame.grid(row=2, column=0, sticky="nsew")
 
-        self.getting_books()
         self.creating_table()
         self.packing_table()
+        change_feed.subscribe(self, self.apply_changes)
 
     def creating_table(self):
-        self.table = ttk.Treeview(
-            self.table_frame,
-            columns=("Title", "Author", "Genre", "Language", "Page Count", "Is Taken?", "Who Took?", "E-Mail"),
-            show="headings"
-        )
-        self.table.heading("Title", text="Title")
-        self.table.heading("Author", text="Author")
-        self.table.heading("Genre", text="Genre")
-        self.table.heading("Language", text="Language")
-        self.table.heading("Page Count", text="Page Count")
-        self.table.heading("Is Taken?", text="Is Taken?")
-        self.table.heading("Who Took?", text="Who Took?")
-        self.table.heading("E-Mail", text="E-Mail")
-
-        self.table.column("Title", width=350, anchor="center")
-        self.table.column("Author", width=120, anchor="center")
-        self.table.column("Genre", width=100, anchor="center")
-        self.table.column("Language", width=100, anchor="center")
-        self.table.column("Page Count", width=80, anchor="center")
-        self.table.column("Is Taken?", width=70, anchor="center")
-        self.table.column("Who Took?", width=150, anchor="center")
-        self.table.column("E-Mail", width=300, anchor="center")
+        self.search_label = ttk.Label(self.search_frame, text="Search:")
+        self.search_entry = ttk.Entry(self.search_frame, textvariable=self.search_str)
+        self.search_str.trace_add("write", lambda *args: self.schedule_search())
+        self.loading_label = ttk.Label(self.search_frame, text="", width=20)
+        self.search_label.pack(side="left")
+        self.search_entry.pack(side="left", expand=True, fill="x", padx=(5, 0))
+        self.loading_label.pack(side="left", padx=(10, 0))
 
+        self.table = ttk.Treeview(self.table_frame, columns=[heading for heading, _, _ in COLUMNS], show="headings")
+        for index, (heading, column, width) in enumerate(COLUMNS):
+            self.table.heading(heading, text=heading, command=lambda column=column: self.sort_by(column))
+            self.table.column(heading, width=width, anchor="center")
+            self.filter_frame.columnconfigure(index, minsize=width)
+            variable = self.filter_vars[column] = tk.StringVar()
+            variable.trace_add("write", lambda *args: self.schedule_search())
+            if column == "is_taken":
+                widget = ttk.Combobox(self.filter_frame, textvariable=variable, values=("", "True", "False"), state="readonly", width=1)
+            elif column in ("author", "genre", "language"):
+                widget = ttk.Combobox(self.filter_frame, textvariable=variable, width=1)
+            else:
+                widget = ttk.Entry(self.filter_frame, textvariable=variable, width=1)
+            widget.grid(row=0, column=index, sticky="ew", padx=1)
+            self.filter_widgets[column] = widget
+
+        self.scrollbar = ttk.Scrollbar(self.table_frame, orient="vertical", command=self.table.yview)
+        self.table.configure(yscrollcommand=self.on_table_scroll)
+        self.scrollbar.pack(side="right", fill="y")
         self.table.pack(expand=True, fill='both')
 
         self.previous_menu_button = ttk.Button(self, text="Go back to previous menu!", command=self.go_back)
 
     def packing_table(self):
-        self.previous_menu_button.grid(row=1, column=0, sticky="ew")
+        self.previous_menu_button.grid(row=3, column=0, sticky="ew")
+
+        self.reload()
+        db_tasks.run(self, lambda: {column: repository.lookup_names(column) for column in ("author", "genre", "language")},
+                     self.show_names, cancellable=False)
+
+    def show_names(self, names):
+        for column, values in names.items():
+            self.filter_widgets[column].config(values=[""] + values)
+
+    # Browsing pages by id, a search pages the FTS results from the edge row,
+    # and a sorted or filtered table pages in the database's sort order from
+    # the sort key of the edge row. Both return the work to run on the database
+    # thread.
+    def next_page(self, last_iid):
+        if self.sort_column or self.filters:
+            column, descending, filters = self.sort_column or "id", self.sort_descending, self.sorted_filters()
+            after = self.sort_keys[last_iid] if last_iid else None
+            return lambda: repository.sorted_books(column, descending, filters, PAGE_SIZE, after=after)
+        query = self.query
+        if query:
+            after_id = int(last_iid) if last_iid else None
+            return lambda: repository.search_books(query, PAGE_SIZE, after_id=after_id)
+        after = int(last_iid) if last_iid else 0
+        return lambda: repository.books_after(after, PAGE_SIZE)
+
+    def previous_page(self, first_iid):
+        if self.sort_column or self.filters:
+            column, descending, filters = self.sort_column or "id", self.sort_descending, self.sorted_filters()
+            before = self.sort_keys[first_iid]
+            return lambda: repository.sorted_books(column, descending, filters, PAGE_SIZE, before=before)
+        query, before = self.query, int(first_iid)
+        if query:
+            return lambda: repository.search_books(query, PAGE_SIZE, before_id=before)
+        return lambda: repository.books_before(before, PAGE_SIZE)
+
+    # With a sort or column filters the search box becomes one more filter.
+    def sorted_filters(self):
+        return self.filters + (("text", self.query),) if self.query else self.filters
+
+    # None when the page count filter cannot be read.
+    def read_filters(self):
+        filters = []
+        for column, variable in self.filter_vars.items():
+            text = variable.get().strip()
+            if not text:
+                continue
+            if column == "page":
+                value = page_filter(text)
+                if value is None:
+                    return None
+            elif column == "is_taken":
+                value = text == "True"
+            else:
+                value = text
+            filters.append((column, value))
+        return tuple(filters)
+
+    # Each click on a heading sorts ascending, then descending, then not at all.
+    def sort_by(self, column):
+        if column != self.sort_column:
+            self.sort_column, self.sort_descending = column, False
+        elif not self.sort_descending:
+            self.sort_descending = True
+        else:
+            self.sort_column, self.sort_descending = None, False
+        for heading, name, _ in COLUMNS:
+            arrow = (" \u25bc" if self.sort_descending else " \u25b2") if name == self.sort_column else ""
+            self.table.heading(heading, text=heading + arrow)
+        self.reload()
+
+    def schedule_search(self):
+        if self.search_job is not None:
+            self.after_cancel(self.search_job)
+        self.search_job = self.after(SEARCH_DELAY_MS, self.run_search)
+
+    def run_search(self):
+        self.search_job = None
+        query = self.search_str.get().strip()
+        filters = self.read_filters()
+        if filters is None:
+            self.loading_label.config(text="Pages: <300, 100-300")
+            return
+        if (query, filters) == (self.query, self.filters):
+            self.loading_label.config(text="")
+            return
+        self.query, self.filters = query, filters
+        self.reload()
+
+    def reload(self):
+        db_tasks.cancel(self)
+        if self.insert_job is not None:
+            self.after_cancel(self.insert_job)
+            self.insert_job = None
+        self.table.delete(*self.table.get_children())
+        self.sort_keys.clear()
+        self.load(self.next_page(None), 'end')
+        self.table.yview_moveto(0)
+
+    def load(self, work, position, anchor=None):
+        self.loading_page = True
+        self.loading_label.config(text="Loading...")
+        self.load_task = db_tasks.run(self, work, lambda books: self.insert_books(books, position, anchor), self.load_failed)
+
+    def load_failed(self, error):
+        self.load_task = None
+        self.loading_page = False
+        self.loading_label.config(text="Load failed")
+
+    # Only a bounded window of rows lives in the Treeview. Reaching either
+    # edge fetches the neighbouring page by id and drops rows from the far end.
+    # Rows go in a chunk per event-loop turn so scrolling stays responsive;
+    # loading_page stays set until the last chunk is in.
+    def insert_books(self, books, position, anchor=None):
+        self.load_task = None
+        column = self.sort_column or "id"
+        for book in books:
+            self.sort_keys[str(book.id)] = sort_key(book, column)
+        if position != 'end':
+            books = books[::-1]
+        self.insert_chunk(books, 0, position, anchor)
+
+    def insert_chunk(self, books, start, position, anchor):
+        for book in books[start:start + CHUNK_ROWS]:
+            # A book edited while paging can come round again.
+            if not self.table.exists(str(book.id)):
+                self.table.insert('', position, iid=str(book.id), values=book.display_values())
+        if start + CHUNK_ROWS < len(books):
+            self.insert_job = self.after(1, self.insert_chunk, books, start + CHUNK_ROWS, position, anchor)
+            return
+        self.insert_job = None
+        if anchor is not None:
+            self.trim_rows(from_top=(position == 'end'))
+            self.table.see(anchor)
+        self.loading_label.config(text="")
+        self.loading_page = False
+
+    # Only rows currently in the window are touched; new books show up when
+    # the user pages to them. Rows that no longer match the search and filters
+    # are dropped, and so are rows whose sort key changed: they belong
+    # elsewhere in the order and would leave a stale paging cursor.
+    def forget_books(self, changes):
+        return [book_id for book_id in changes if self.table.exists(str(book_id))]
+
+    def change_filters(self):
+        return self.sorted_filters()
+
+    def show_changes(self, visible, books):
+        column = self.sort_column or "id"
+        found = set()
+        for book in books:
+            iid = str(book.id)
+            if self.table.exists(iid) and sort_key(book, column) == self.sort_keys.get(iid):
+                found.add(book.id)
+                self.table.item(iid, values=book.display_values())
+        removed = [str(book_id) for book_id in visible if book_id not in found and self.table.exists(str(book_id))]
+        if removed:
+            self.table.delete(*removed)
+            for iid in removed:
+                self.sort_keys.pop(iid, None)
 
-        for book in self.books:
-            self.table.insert('', 'end', values=(
-                book[1], book[2], book[3], book[4], 
-                book[5], book[6], book[7], book[8]
-            ))
+    def on_table_scroll(self, first, last):
+        self.scrollbar.set(first, last)
+        if not self.loading_page:
+            self.loading_page = True
+            self.after_idle(self.load_neighbour_page, float(first), float(last))
 
-    def getting_books(self):
-        connection = sqlite3.connect("library.db")
-        cursor = connection.cursor()
-        cursor.execute("SELECT * FROM book_properties")
-        rows = cursor.fetchall()
-        connection.close()
+    def load_neighbour_page(self, first, last):
+        rows = self.table.get_children()
+        if rows and last >= 1 - EDGE_THRESHOLD:
+            self.load(self.next_page(rows[-1]), 'end', rows[-1])
+            return
+        if rows and first <= EDGE_THRESHOLD:
+            self.load(self.previous_page(rows[0]), 0, rows[0])
+            return
+        self.loading_page = False
 
-        self.books.extend(rows)
+    def trim_rows(self, from_top):
+        rows = self.table.get_children()
+        extra = len(rows) - WINDOW_ROWS
+        if extra > 0:
+            trimmed = rows[:extra] if from_top else rows[-extra:]
+            self.table.delete(*trimmed)
+            for iid in trimmed:
+                self.sort_keys.pop(iid, None)
 
     def go_back(self):
-        if self.location == "user":
-            self.withdraw() 
-            add_book_window = user_dashboard.userDashboard(self.username)
-            add_book_window.wait_window()
-            self.deiconify()
-        elif self.location == "admin":
-            self.withdraw() 
-            add_book_window = admin_dashboard.adminDashboard(self.username)
-            add_book_window.wait_window()
-            self.deiconify()
\ No newline at end of file
+        navigator.back()
\ No newline at end of file
@@ -0,0 +1,50 @@
+import hashlib
+import hmac
+import os
+import sqlite3
+
+from database import repository
+
+HASH_PREFIX = "pbkdf2_sha256"
+ITERATIONS = 200_000
+
+OK = "ok"
+UNKNOWN_USER = "unknown_user"
+WRONG_PASSWORD = "wrong_password"
+
+
+def hash_password(password, iterations=ITERATIONS):
+    salt = os.urandom(16).hex()
+    digest = hashlib.pbkdf2_hmac("sha256", password.encode(), bytes.fromhex(salt), iterations).hex()
+    return f"{HASH_PREFIX}${iterations}${salt}${digest}"
+
+
+def verify_password(password, stored):
+    if not stored.startswith(HASH_PREFIX + "$"):
+        # Accounts created before passwords were hashed; rehashed on next login.
+        return hmac.compare_digest(password.encode(), stored.encode())
+    _, iterations, salt, digest = stored.split("$")
+    candidate = hashlib.pbkdf2_hmac("sha256", password.encode(), bytes.fromhex(salt), int(iterations)).hex()
+    return hmac.compare_digest(candidate, digest)
+
+
+# One lookup on the unique name index returns the id, password hash and role;
+# nothing about other members is loaded.
+def authenticate(name, password):
+    user = repository.find_user(name)
+    if user is None:
+        return UNKNOWN_USER, None
+    if not verify_password(password, user.password):
+        return WRONG_PASSWORD, None
+    if not user.password.startswith(HASH_PREFIX + "$"):
+        repository.set_password(user.id, hash_password(password))
+    return OK, user.isadmin
+
+
+# Returns the new member's id, or None if the name was taken, possibly by
+# another desk a moment earlier.
+def register(name, password, isadmin):
+    try:
+        return repository.create_user(name, hash_password(password), isadmin)
+    except sqlite3.IntegrityError:
+        return None
@@ -0,0 +1,111 @@
+import bisect
+from tkinter import ttk
+
+from background import db_tasks
+
+TOP_N = 20
+SEARCH_DELAY_MS = 250
+
+
+# Titles sorted by their casefolded form, so all titles starting with a prefix
+# sit next to each other and are found with one bisect. Copies of the same
+# title are counted rather than stored twice.
+class PrefixIndex:
+    def __init__(self, titles=()):
+        self.counts = {}
+        for title in titles:
+            self.counts[title] = self.counts.get(title, 0) + 1
+        self.entries = sorted((title.casefold(), title) for title in self.counts)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def add(self, title):
+        if title in self.counts:
+            self.counts[title] += 1
+        else:
+            self.counts[title] = 1
+            bisect.insort(self.entries, (title.casefold(), title))
+
+    def remove(self, title):
+        count = self.counts.get(title, 0)
+        if count > 1:
+            self.counts[title] = count - 1
+        elif count == 1:
+            del self.counts[title]
+            entry = (title.casefold(), title)
+            position = bisect.bisect_left(self.entries, entry)
+            if position < len(self.entries) and self.entries[position] == entry:
+                del self.entries[position]
+
+    def matches(self, prefix, limit):
+        prefix = prefix.casefold()
+        position = bisect.bisect_left(self.entries, (prefix,))
+        found = []
+        while position < len(self.entries) and len(found) < limit:
+            key, title = self.entries[position]
+            if not key.startswith(prefix):
+                break
+            found.append(title)
+            position += 1
+        return found
+
+    def titles(self, limit):
+        return [title for _, title in self.entries[:limit]]
+
+
+# A combobox whose drop-down only ever holds the top matches. Each keystroke
+# narrows it through the prefix index; when that finds fewer than limit
+# titles, search(text, limit) runs on the database thread after a pause to
+# add matches from the middle of titles (the catalog's full-text search).
+class AutocompleteCombobox(ttk.Combobox):
+    def __init__(self, master, search=None, limit=TOP_N, placeholder="", **kwargs):
+        super().__init__(master, **kwargs)
+        self.index = PrefixIndex()
+        self.search = search
+        self.limit = limit
+        self.placeholder = placeholder
+        self.search_job = None
+        self.bind("<KeyRelease>", lambda event: self.narrow())
+
+    def set_titles(self, titles):
+        self.set_index(PrefixIndex(titles))
+
+    # For an index built off the Tk thread.
+    def set_index(self, index):
+        self.index = index
+        self.narrow()
+
+    def add_title(self, title):
+        self.index.add(title)
+
+    def remove_title(self, title):
+        self.index.remove(title)
+
+    def typed_text(self):
+        text = self.get()
+        return "" if text == self.placeholder else text.strip()
+
+    def narrow(self):
+        text = self.typed_text()
+        values = self.index.matches(text, self.limit) if text else self.index.titles(self.limit)
+        self['values'] = values
+        if self.search_job is not None:
+            self.after_cancel(self.search_job)
+            self.search_job = None
+        if self.search is not None and text and len(values) < self.limit:
+            self.search_job = self.after(SEARCH_DELAY_MS, self.extend_with_search, text)
+
+    def extend_with_search(self, text):
+        self.search_job = None
+        if text == self.typed_text():
+            db_tasks.run(self, lambda: self.search(text, self.limit), lambda titles: self.add_matches(text, titles))
+
+    def add_matches(self, text, titles):
+        if text != self.typed_text():
+            return
+        values = list(self['values'])
+        for title in titles:
+            if title not in values and title in self.index.counts:
+                values.append(title)
+        self['values'] = values[:self.limit]
@@ -0,0 +1,123 @@
+import queue
+import threading
+import tkinter as tk
+from concurrent.futures import ThreadPoolExecutor
+
+import database
+
+POLL_MS = 20
+
+
+class Task:
+    def __init__(self, owner, done, failed, cancellable):
+        self.owner = owner
+        self.done = done
+        self.failed = failed
+        self.cancellable = cancellable
+        self.cancelled = False
+        self.future = None
+        self.connection = None
+        self.lock = threading.Lock()
+
+    # A task that has not started is dropped; a running database read is
+    # interrupted, which makes its statement fail with "interrupted". Either
+    # way its callbacks are never called.
+    def cancel(self):
+        with self.lock:
+            self.cancelled = True
+            if self.future is not None:
+                self.future.cancel()
+            if self.connection is not None:
+                self.connection.interrupt()
+
+
+# Runs work on worker threads and hands the result to done(result), or the
+# exception to failed(error), on the Tk thread: finished tasks are queued and
+# drained with after(). Tasks belong to a widget (normally the screen) so
+# leaving the screen can cancel them and results for destroyed widgets are
+# dropped. Writes pass cancellable=False: they always run to the end and
+# report back if the screen still exists.
+class BackgroundTasks:
+    def __init__(self, workers, name, connection=None):
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=name)
+        self.connection = connection
+        self.results = queue.Queue()
+        self.tasks = []
+        self.polling = False
+
+    def run(self, owner, work, done, failed=None, cancellable=True):
+        task = Task(owner, done, failed, cancellable)
+        self.tasks.append(task)
+        with task.lock:
+            task.future = self.executor.submit(self.execute, task, work)
+        task.future.add_done_callback(lambda future: self.results.put((task, future)))
+        if not self.polling:
+            self.polling = True
+            root = owner._root()
+            root.after(POLL_MS, self.drain, root)
+        return task
+
+    def execute(self, task, work):
+        if self.connection is not None and task.cancellable:
+            connection = self.connection()
+            with task.lock:
+                if task.cancelled:
+                    return None
+                task.connection = connection
+        try:
+            return work()
+        finally:
+            with task.lock:
+                task.connection = None
+
+    def cancel(self, owner):
+        for task in self.tasks:
+            if task.owner is owner and task.cancellable:
+                task.cancel()
+
+    def drain(self, root):
+        while True:
+            try:
+                task, future = self.results.get_nowait()
+            except queue.Empty:
+                break
+            self.tasks.remove(task)
+            if task.cancelled or future.cancelled() or not alive(task.owner):
+                continue
+            error = future.exception()
+            try:
+                if error is None:
+                    task.done(future.result())
+                elif task.failed is not None:
+                    task.failed(error)
+                else:
+                    root.report_callback_exception(type(error), error, error.__traceback__)
+            except tk.TclError:
+                # The owner was destroyed while the callback ran.
+                pass
+        if self.tasks:
+            try:
+                root.after(POLL_MS, self.drain, root)
+                return
+            except tk.TclError:
+                pass
+        self.polling = False
+
+
+def alive(widget):
+    try:
+        return bool(widget.winfo_exists())
+    except tk.TclError:
+        return False
+
+
+# One database worker: SQLite runs one writer at a time anyway, and a single
+# connection does not see its own commits as foreign ones, so the query cache
+# keeps its precise invalidation. Image decoding gets its own threads.
+db_tasks = BackgroundTasks(1, "database", connection=database.get_connection)
+image_tasks = BackgroundTasks(2, "image")
+
+
+def cancel_all(owner):
+    db_tasks.cancel(owner)
+    image_tasks.cancel(owner)
@@ -0,0 +1,93 @@
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import time
+
+import checkout
+import database
+
+
+def build_catalog(path, titles, copies):
+    database.configure(path)
+    con = database.get_connection()
+    with con:
+        database.insert_books(con, (("default_image.png", f"Title {title}", "Author", "Genre", "English", 100)
+                                    for title in range(titles) for _ in range(copies)))
+    database.close_all()
+
+
+def checkout_worker(path, desk, mode, titles, copies, seconds, start, results):
+    database.configure(path)
+    database.get_connection()
+    counts = {checkout.CHECKED_OUT: 0, checkout.CONFLICT: 0, checkout.NOT_AVAILABLE: 0}
+    taken = []
+    start.wait()
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        if mode == "id":
+            book_id = random.randint(1, titles * copies)
+            result = checkout.checkout_book(book_id, f"desk{desk}", None)
+        else:
+            result, book_id = checkout.checkout_title(f"Title {random.randrange(titles)}", f"desk{desk}", None)
+        counts[result] += 1
+        if result == checkout.CHECKED_OUT:
+            taken.append(book_id)
+    results.put((counts, taken))
+
+
+# Desks in separate processes race for a small set of popular titles. Every
+# successful checkout must have taken a different copy.
+def main():
+    parser = argparse.ArgumentParser(description="Checkout throughput under contention.")
+    parser.add_argument("--processes", type=int, default=8)
+    parser.add_argument("--titles", type=int, default=20)
+    parser.add_argument("--copies", type=int, default=5000)
+    parser.add_argument("--mode", choices=("title", "id"), default="title",
+                        help="check out any copy of a title, or one random copy by id (produces conflicts)")
+    parser.add_argument("--seconds", type=float, default=5.0)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "checkout.db")
+        build_catalog(path, args.titles, args.copies)
+        start = multiprocessing.Event()
+        results = multiprocessing.Queue()
+        workers = [multiprocessing.Process(target=checkout_worker, args=(path, desk, args.mode, args.titles, args.copies, args.seconds, start, results))
+                   for desk in range(args.processes)]
+        for worker in workers:
+            worker.start()
+        start.set()
+        outcomes = [results.get() for _ in workers]
+        for worker in workers:
+            worker.join()
+        database.configure(path)
+        taken_in_db = database.get_connection().execute("SELECT COUNT(*) FROM books WHERE is_taken = 1").fetchone()[0]
+        database.close_all()
+
+    totals = {}
+    taken = []
+    for counts, ids in outcomes:
+        taken.extend(ids)
+        for result, count in counts.items():
+            totals[result] = totals.get(result, 0) + count
+    report = {
+        "benchmark": "checkout",
+        "mode": args.mode,
+        "processes": args.processes,
+        "seconds": args.seconds,
+        "results": totals,
+        "checkouts_per_second": round(totals[checkout.CHECKED_OUT] / args.seconds, 1),
+        "double_checkouts": len(taken) - len(set(taken)),
+        "taken_in_database": taken_in_db,
+    }
+    print(json.dumps(report, indent=2))
+    if report["double_checkouts"] or taken_in_db != len(taken):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
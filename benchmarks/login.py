@@ -0,0 +1,71 @@
+import argparse
+import json
+import os
+import random
+import statistics
+import tempfile
+import time
+
+import auth
+import database
+from profiling import percentile
+from query_cache import query_cache
+
+BENCH_ITERATIONS = 1000
+
+
+def build_members(path, count):
+    database.configure(path)
+    # Every member shares one cheap hash: building a million PBKDF2 hashes
+    # would take hours and the lookup cost does not depend on the hash.
+    stored = auth.hash_password("secret", iterations=BENCH_ITERATIONS)
+    con = database.get_connection()
+    with con:
+        con.executemany("INSERT INTO userdatabase (id, name, password, isadmin) VALUES (?, ?, ?, 0)",
+                        ((i, f"member{i}", stored) for i in range(1, count + 1)))
+
+
+def summarize(timings):
+    timings.sort()
+    return {
+        "median_us": round(statistics.median(timings), 1),
+        "p95_us": round(percentile(timings, 0.95), 1),
+    }
+
+
+# find_user is served from the query cache once a name has been seen, so cold
+# logins clear the cache first and time the database lookup; warm logins
+# repeat the same names against a filled cache.
+def time_logins(count, lookups):
+    names = [f"member{random.randint(1, count)}" for _ in range(lookups)]
+    results = {"members": count}
+    for phase in ("cold", "warm"):
+        timings = []
+        for name in names:
+            if phase == "cold":
+                query_cache.clear()
+            started = time.perf_counter()
+            result, _ = auth.authenticate(name, "secret")
+            timings.append((time.perf_counter() - started) * 1e6)
+            assert result == auth.OK
+        results[phase] = summarize(timings)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Login latency for growing member counts.")
+    parser.add_argument("--sizes", default="1000,10000,100000,1000000")
+    parser.add_argument("--lookups", type=int, default=500)
+    args = parser.parse_args()
+
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        for count in (int(size) for size in args.sizes.split(",")):
+            build_members(os.path.join(directory, f"members-{count}.db"), count)
+            results.append(time_logins(count, args.lookups))
+            database.close_all()
+    print(json.dumps({"benchmark": "login", "pbkdf2_iterations": BENCH_ITERATIONS, "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+import argparse
+import gc
+from array import array
+import json
+import os
+import sys
+import tempfile
+import tracemalloc
+
+import database
+from benchmarks import synthetic
+from models import Book
+
+PER_BOOKS = 100_000
+
+
+def allocated(build):
+    gc.collect()
+    tracemalloc.start()
+    result = build()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del result
+    return size
+
+
+def layouts():
+    def tuples():
+        return database.get_connection().execute(f"{database.BOOK_SELECT} ORDER BY b.id").fetchall()
+
+    def dicts():
+        cursor = database.get_connection().execute(f"{database.BOOK_SELECT} ORDER BY b.id")
+        return [dict(zip(Book.__slots__, row)) for row in cursor]
+
+    def books():
+        cursor = database.get_connection().execute(f"{database.BOOK_SELECT} ORDER BY b.id")
+        return [Book(*row) for row in cursor]
+
+    # Column by column: ids, page counts, row versions and the taken flag in
+    # typed arrays, author/genre/language as codes into name lists, titles
+    # interned so copies of a title share one string, and borrowers only for
+    # copies on loan. No screen keeps the catalog this way; it is here to
+    # size the layout against the others.
+    def columnar():
+        columns = {"ids": array("q"), "pages": array("l"), "row_versions": array("q"), "taken": array("b"),
+                   "titles": [], "image_paths": [], "borrowers": {}, "emails": {}}
+        codes = {lookup: array("I") for lookup in database.LOOKUPS}
+        names = {lookup: {None: 0} for lookup in database.LOOKUPS}
+        cursor = database.get_connection().execute(f"{database.BOOK_SELECT} ORDER BY b.id")
+        for row in cursor:
+            book = Book(*row)
+            columns["ids"].append(book.id)
+            columns["pages"].append(book.page if isinstance(book.page, int) else -1)
+            columns["row_versions"].append(book.row_version)
+            columns["taken"].append(book.is_taken)
+            columns["titles"].append(sys.intern(book.title))
+            columns["image_paths"].append(sys.intern(book.image_path) if book.image_path else None)
+            for lookup in codes:
+                codes[lookup].append(names[lookup].setdefault(getattr(book, lookup), len(names[lookup])))
+            if book.who_took is not None:
+                columns["borrowers"][book.id] = book.who_took
+            if book.email is not None:
+                columns["emails"][book.id] = book.email
+        return columns, codes, names
+
+    return {"tuples": tuples, "dicts": dicts, "slotted_books": books, "columnar": columnar}
+
+
+# Memory held by the whole catalog in each in-memory layout, measured with
+# tracemalloc and scaled to 100k books.
+def main():
+    parser = argparse.ArgumentParser(description="Memory used by the catalog in each in-memory layout.")
+    parser.add_argument("--books", type=int, default=PER_BOOKS)
+    parser.add_argument("--loans", type=int, default=PER_BOOKS // 5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        synthetic.generate(os.path.join(directory, "library.db"), 1000, args.books, args.loans)
+        database.configure(os.path.join(directory, "library.db"))
+        results = {}
+        for name, build in layouts().items():
+            size = allocated(build)
+            results[name] = {"bytes_per_book": round(size / args.books, 1),
+                             "mb_per_100k_books": round(size / args.books * PER_BOOKS / 2 ** 20, 1)}
+        database.close_all()
+    print(json.dumps({"benchmark": "memory", "books": args.books, "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+import argparse
+import json
+import multiprocessing
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+import auth
+import database
+from database import repository
+from profiling import percentile
+
+
+def signup_worker(path, desk, signups, start, results):
+    database.configure(path)
+    stored = auth.hash_password("secret", iterations=1000)
+    start.wait()
+    outcome = []
+    for number in range(signups):
+        started = time.perf_counter()
+        user_id = repository.create_user(f"desk{desk}member{number}", stored, 0)
+        outcome.append((user_id, (time.perf_counter() - started) * 1000))
+    results.put(outcome)
+
+
+# Several processes sign members up against one database at the same moment;
+# every signup must get its own id and none may fail.
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent signup stress test.")
+    parser.add_argument("--processes", type=int, default=8)
+    parser.add_argument("--signups", type=int, default=200, help="signups per process")
+    parser.add_argument("--max-latency-ms", type=float, default=1000.0)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "signups.db")
+        database.configure(path)
+        database.get_connection()
+        database.close_all()
+
+        start = multiprocessing.Event()
+        results = multiprocessing.Queue()
+        workers = [multiprocessing.Process(target=signup_worker, args=(path, desk, args.signups, start, results))
+                   for desk in range(args.processes)]
+        for worker in workers:
+            worker.start()
+        start.set()
+        outcomes = [results.get() for _ in workers]
+        for worker in workers:
+            worker.join()
+
+    ids = [user_id for outcome in outcomes for user_id, _ in outcome]
+    latencies = sorted(latency for outcome in outcomes for _, latency in outcome)
+    expected = args.processes * args.signups
+    report = {
+        "benchmark": "signup_stress",
+        "signups": len(ids),
+        "distinct_ids": len(set(ids)),
+        "median_ms": round(statistics.median(latencies), 2),
+        "p99_ms": round(percentile(latencies, 0.99), 2),
+        "max_ms": round(latencies[-1], 2),
+    }
+    print(json.dumps(report, indent=2))
+    if len(ids) != expected or len(set(ids)) != expected or latencies[-1] > args.max_latency_ms:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+import argparse
+import json
+import os
+import sqlite3
+import statistics
+import tempfile
+import time
+
+import database
+import schema
+from benchmarks import synthetic
+
+LEGACY_VERSION = 8
+COMPACT_VERSION = 9
+# The later migrations that add indexes, sized one by one on top of the
+# compact layout.
+INDEX_MIGRATIONS = {10: "sort_filter_indexes", 11: "search_prefixes"}
+
+# The same questions asked of the text-flag layout (schema 8) and of the
+# compact layout (schema 9), each in the form the code of that version used.
+QUERIES = {
+    "available_titles": (
+        "SELECT id, title FROM book_properties WHERE is_taken = 'False'",
+        "SELECT id, title FROM books WHERE is_taken = 0",
+        ()),
+    "taken_titles": (
+        "SELECT id, title FROM book_properties WHERE is_taken = 'True'",
+        "SELECT id, title FROM books WHERE is_taken = 1",
+        ()),
+    "first_page": (
+        "SELECT * FROM book_properties WHERE id > 0 ORDER BY id LIMIT 100",
+        f"{database.BOOK_SELECT} WHERE b.id > 0 ORDER BY b.id LIMIT 100",
+        ()),
+    "count_by_genre": (
+        "SELECT COUNT(*) FROM book_properties WHERE genre = ?",
+        "SELECT COUNT(*) FROM books WHERE genre_id = (SELECT id FROM genres WHERE name = ?)",
+        ("Poetry",)),
+    "books_per_language": (
+        "SELECT language, COUNT(*) FROM book_properties GROUP BY language",
+        "SELECT l.name, COUNT(*) FROM books b LEFT JOIN languages l ON l.id = b.language_id GROUP BY b.language_id",
+        ()),
+    "loans_list": (
+        "SELECT id, title, who_took, email FROM book_properties WHERE is_taken = 'True' ORDER BY who_took, title LIMIT 2000",
+        "SELECT id, title, who_took, email FROM books WHERE is_taken = 1 ORDER BY who_took, title LIMIT 2000",
+        ()),
+}
+
+
+def build_legacy(path, users, books, loans):
+    # Generate with the current code, then copy the rows through the
+    # book_properties view into a database that stops at schema 8.
+    with tempfile.TemporaryDirectory() as directory:
+        source = os.path.join(directory, "source.db")
+        synthetic.generate(source, users, books, loans)
+        con = sqlite3.connect(path, isolation_level=None)
+        schema.migrate(con, LEGACY_VERSION)
+        con.execute("ATTACH DATABASE ? AS source", (source,))
+        con.execute("BEGIN")
+        con.execute("INSERT INTO userdatabase SELECT * FROM source.userdatabase")
+        con.execute("INSERT INTO book_properties (id, image_path, title, author, genre, language, page, is_taken, who_took, email) "
+                    "SELECT id, image_path, title, author, genre, language, page, is_taken, who_took, email FROM source.book_properties")
+        con.execute("INSERT INTO loans SELECT * FROM source.loans")
+        con.execute("COMMIT")
+        con.execute("DETACH DATABASE source")
+        con.execute("VACUUM")
+        con.close()
+
+
+def measure(path, column, runs):
+    con = sqlite3.connect(path)
+    con.execute("ANALYZE")
+    timings = {}
+    for name, statements in QUERIES.items():
+        sql, parameters = statements[column], statements[2]
+        samples = []
+        for _ in range(runs):
+            started = time.perf_counter()
+            con.execute(sql, parameters).fetchall()
+            samples.append((time.perf_counter() - started) * 1000)
+        timings[name] = round(statistics.median(samples), 3)
+    con.close()
+    return {"size_bytes": os.path.getsize(path), "median_ms": timings}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Database size and query time before and after the compact book layout.")
+    parser.add_argument("--users", type=int, default=10000)
+    parser.add_argument("--books", type=int, default=100000)
+    parser.add_argument("--loans", type=int, default=20000)
+    parser.add_argument("--runs", type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        before = os.path.join(directory, "before.db")
+        after = os.path.join(directory, "after.db")
+        build_legacy(before, args.users, args.books, args.loans)
+        with sqlite3.connect(before) as src, sqlite3.connect(after) as dst:
+            src.backup(dst)
+
+        con = sqlite3.connect(after, isolation_level=None)
+        started = time.perf_counter()
+        schema.migrate(con, COMPACT_VERSION)
+        migration_seconds = time.perf_counter() - started
+        con.execute("VACUUM")
+        con.close()
+
+        # The indexes trade space for query speed, so they are added on a
+        # copy and the layout change is compared on its own.
+        indexed = os.path.join(directory, "indexed.db")
+        with sqlite3.connect(after) as src, sqlite3.connect(indexed) as dst:
+            src.backup(dst)
+        index_overhead = {}
+        size = os.path.getsize(after)
+        for version, name in INDEX_MIGRATIONS.items():
+            con = sqlite3.connect(indexed, isolation_level=None)
+            schema.migrate(con, version)
+            con.execute("VACUUM")
+            con.close()
+            index_overhead[name] = os.path.getsize(indexed) - size
+            size = os.path.getsize(indexed)
+
+        report = {
+            "benchmark": "storage",
+            "books": args.books,
+            "migration_seconds": round(migration_seconds, 2),
+            "before": measure(before, 0, args.runs),
+            "after": measure(after, 1, args.runs),
+        }
+        report["index_overhead_bytes"] = index_overhead
+    report["size_change"] = round(report["after"]["size_bytes"] / report["before"]["size_bytes"] - 1, 3)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,204 @@
+import argparse
+import json
+import os
+import platform
+import random
+import sqlite3
+import statistics
+import tempfile
+import time
+
+import auth
+import checkout
+import database
+import outbox
+from autocomplete import PrefixIndex
+from benchmarks import synthetic
+from database import repository
+from profiling import percentile
+from query_cache import query_cache
+
+# The same page size AllBooks asks for when it opens.
+PAGE_SIZE = 100
+SCREEN_TIMEOUT = 30
+
+
+def summarize(timings):
+    if not timings:
+        return {"runs": 0}
+    timings = sorted(timings)
+    return {
+        "runs": len(timings),
+        "median_ms": round(statistics.median(timings), 3),
+        "p95_ms": round(percentile(timings, 0.95), 3),
+        "min_ms": round(timings[0], 3),
+        "max_ms": round(timings[-1], 3),
+    }
+
+
+def measure(action, runs, setup=None):
+    timings = []
+    for _ in range(runs):
+        if setup is not None:
+            setup()
+        started = time.perf_counter()
+        action()
+        timings.append((time.perf_counter() - started) * 1000)
+    return summarize(timings)
+
+
+def bench_login(runs, users):
+    def action():
+        result, _ = auth.authenticate(f"member{random.randint(1, users)}", synthetic.PASSWORD)
+        assert result == auth.OK
+    return measure(action, runs, query_cache.clear)
+
+
+# What RequestBook does when it opens: load the available copies and build
+# the autocomplete index over their titles. Reads are timed from the
+# database (cache cleared first) and again when served by the query cache.
+def bench_available_titles(runs, cached=False):
+    return measure(lambda: PrefixIndex(title for _, title in repository.available_books()), runs,
+                   None if cached else query_cache.clear)
+
+
+def bench_all_books_load(runs, cached=False):
+    return measure(lambda: repository.books_after(0, PAGE_SIZE), runs, None if cached else query_cache.clear)
+
+
+# The AllBooks filter users asked for, sorted by title and by page count.
+SHELF_FILTER = (("language", "French"), ("genre", "Science Fiction"), ("is_taken", False), ("page", (("<", 300),)))
+
+
+def bench_sorted_filtered(runs, column):
+    return measure(lambda: repository.sorted_books(column, False, SHELF_FILTER, PAGE_SIZE), runs, query_cache.clear)
+
+
+def bench_checkout(runs):
+    titles = list(dict.fromkeys(title for _, title in repository.available_books()))
+    random.shuffle(titles)
+
+    def action():
+        result, _ = checkout.checkout_title(titles.pop(), "member1", "member1@example.com")
+        assert result == checkout.CHECKED_OUT
+    return measure(action, min(runs, len(titles)))
+
+
+def bench_request_back(runs):
+    titles = [title for _, title in repository.taken_books()]
+
+    def action():
+        title = random.choice(titles)
+        email = repository.borrower_email(title)
+        outbox.queue_email(email, f"Please return \"{title}\"", f"The library needs \"{title}\" back.")
+    return measure(action, runs if titles else 0)
+
+
+# Signups pay for the full PBKDF2 hash, so this is dominated by auth.ITERATIONS.
+def bench_signup(runs):
+    names = iter(f"bench{time.time_ns()}_{number}" for number in range(runs))
+    return measure(lambda: auth.register(next(names), synthetic.PASSWORD, 0), runs)
+
+
+# Screen constructors need a display (use xvfb-run on a headless machine).
+# A screen counts as open once its first load from the database thread is
+# shown: the titles are indexed, or every row of AllBooks' first page is in.
+def bench_screens(runs):
+    import tkinter as tk
+    try:
+        root = tk.Tk()
+    except tk.TclError as error:
+        return {"skipped": str(error)}
+    root.withdraw()
+    from all_books import AllBooks
+    from background import cancel_all
+    from request_book import RequestBook
+    from request_book_back import RequestBookBack
+
+    def open_screen(screen_class, *args):
+        screen = screen_class(*args)
+        deadline = time.perf_counter() + SCREEN_TIMEOUT
+        while screen.load_task is not None or getattr(screen, "loading_page", False):
+            if time.perf_counter() > deadline:
+                raise RuntimeError(f"{screen_class.__name__} did not load within {SCREEN_TIMEOUT} s")
+            screen.update()
+            time.sleep(0.001)
+        cancel_all(screen)
+        screen.destroy()
+    results = {
+        "all_books": measure(lambda: open_screen(AllBooks, "bench", "member1"), runs),
+        "request_book": measure(lambda: open_screen(RequestBook, "member1"), runs),
+        "request_book_back": measure(lambda: open_screen(RequestBookBack, "member1"), runs),
+    }
+    root.destroy()
+    return results
+
+
+def copy_database(source, target):
+    with sqlite3.connect(source) as src, sqlite3.connect(target) as dst:
+        src.backup(dst)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time the library's main code paths against a synthetic database.")
+    parser.add_argument("--users", type=int, default=10000)
+    parser.add_argument("--books", type=int, default=100000)
+    parser.add_argument("--loans", type=int, default=20000)
+    parser.add_argument("--database", help="benchmark a copy of this database instead of generating one; "
+                                           "its members must be named member1..memberN with password 'secret'")
+    parser.add_argument("--runs", type=int, default=200)
+    parser.add_argument("--signup-runs", type=int, default=10)
+    parser.add_argument("--gui", action="store_true", help="also time opening the screens (needs a display)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write the JSON report here as well as to stdout")
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "library.db")
+        if args.database:
+            copy_database(args.database, path)
+            database.configure(path)
+            dataset = {"source": args.database,
+                       "users": database.get_connection().execute("SELECT COUNT(*) FROM userdatabase").fetchone()[0],
+                       "books": database.get_connection().execute("SELECT COUNT(*) FROM books").fetchone()[0]}
+        else:
+            dataset = synthetic.generate(path, args.users, args.books, args.loans, seed=args.seed)
+            database.configure(path)
+
+        # Reads run before the writes that change what they return.
+        results = {
+            "login": bench_login(args.runs, dataset["users"]),
+            "available_titles": bench_available_titles(max(1, args.runs // 10)),
+            "all_books_load": bench_all_books_load(args.runs),
+            "all_books_sorted_by_title": measure(lambda: repository.sorted_books("title", False, (), PAGE_SIZE), args.runs, query_cache.clear),
+            "all_books_filtered_by_title": bench_sorted_filtered(args.runs, "title"),
+            "all_books_filtered_by_page": bench_sorted_filtered(args.runs, "page"),
+            "available_titles_cached": bench_available_titles(max(1, args.runs // 10), cached=True),
+            "all_books_load_cached": bench_all_books_load(args.runs, cached=True),
+        }
+        if args.gui:
+            results["screens"] = bench_screens(max(1, args.runs // 20))
+        results["checkout"] = bench_checkout(args.runs)
+        results["request_back"] = bench_request_back(args.runs)
+        results["signup"] = bench_signup(args.signup_runs)
+        database.close_all()
+
+    report = {
+        "benchmark": "suite",
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "platform": platform.platform(),
+        "dataset": dataset,
+        "results": results,
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            file.write(text + "\n")
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
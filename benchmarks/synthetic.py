@@ -0,0 +1,73 @@
+import argparse
+import json
+import os
+import random
+import time
+
+import auth
+import database
+
+WORDS = ("river", "shadow", "garden", "winter", "empire", "silent", "night", "stone", "glass", "memory", "ocean",
+         "forest", "golden", "city", "broken", "crown", "storm", "letter", "island", "secret", "iron", "summer")
+FIRST_NAMES = ("Ayla", "Brian", "Chen", "Daniel", "Elif", "Fatma", "Grace", "Hasan", "Ines", "Jonas", "Kemal", "Lena")
+LAST_NAMES = ("Kamweru", "Yilmaz", "Smith", "Okafor", "Novak", "Garcia", "Tanaka", "Schmidt", "Demir", "Rossi")
+GENRES = ("Novel", "History", "Science", "Science Fiction", "Poetry", "Biography", "Fantasy", "Crime", "Children")
+LANGUAGES = ("English", "Turkish", "German", "French", "Swahili", "Spanish")
+PASSWORD = "secret"
+HASH_ITERATIONS = 1000
+DAY = 86400
+
+
+def title_for(number, rng):
+    return f"The {rng.choice(WORDS).title()} {rng.choice(WORDS).title()} {number}"
+
+
+# Builds a library with members member1..memberN (password "secret"), books
+# whose titles come in copies, and open loans of which roughly a third are
+# overdue. The same seed always produces the same library.
+def generate(path, users, books, loans, copies=3, seed=0):
+    rng = random.Random(seed)
+    database.configure(path)
+    con = database.get_connection()
+    # Every member shares one cheap hash, as in benchmarks.login.
+    stored = auth.hash_password(PASSWORD, iterations=HASH_ITERATIONS)
+    titles = [title_for(number, rng) for number in range(max(1, books // copies))]
+    now = int(time.time())
+    with con:
+        con.executemany("INSERT INTO userdatabase (name, password, isadmin) VALUES (?, ?, ?)",
+                        ((f"member{number}", stored, int(number == 1)) for number in range(1, users + 1)))
+        database.insert_books(con, (("default_image.png", titles[number % len(titles)], f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}",
+                                     rng.choice(GENRES), rng.choice(LANGUAGES), rng.randint(40, 900)) for number in range(books)))
+        borrowed = rng.sample(range(1, books + 1), min(loans, books)) if users else []
+        for book_id in borrowed:
+            member = rng.randint(1, users)
+            checked_out_at = now - rng.randint(0, 21 * DAY)
+            con.execute("UPDATE books SET is_taken = 1, who_took = ?, email = ? WHERE id = ?",
+                        (f"member{member}", f"member{member}@example.com", book_id))
+            con.execute("INSERT INTO loans (book_id, user_id, email, checked_out_at, due_at) VALUES (?, ?, ?, ?, ?)",
+                        (book_id, member, f"member{member}@example.com", checked_out_at, checked_out_at + 14 * DAY))
+    con.execute("ANALYZE")
+    database.close_all()
+    return {"users": users, "books": books, "loans": len(borrowed), "titles": len(titles), "seed": seed}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic library database.")
+    parser.add_argument("path", help="database file to create")
+    parser.add_argument("--users", type=int, default=10000)
+    parser.add_argument("--books", type=int, default=100000)
+    parser.add_argument("--loans", type=int, default=20000)
+    parser.add_argument("--copies", type=int, default=3, help="copies per title")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    if os.path.exists(args.path):
+        parser.error(f"{args.path} already exists")
+    started = time.perf_counter()
+    summary = generate(args.path, args.users, args.books, args.loans, args.copies, args.seed)
+    summary["seconds"] = round(time.perf_counter() - started, 2)
+    print(json.dumps(summary, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+import time
+import tkinter as tk
+
+import database
+from database import repository
+from background import db_tasks
+
+POLL_MS = 1000
+RETENTION = 24 * 3600
+PRUNE_INTERVAL = 3600
+
+
+# Triggers append every insert, update and delete on books to
+# book_changes. The feed is driven by the Tk event loop but every query runs
+# on the database thread, one poll at a time: PRAGMA data_version changes when
+# another connection commits and total_changes when this one writes, so an
+# idle poll reads nothing from the log. Listeners get the (book_id, op) pairs
+# since the last poll, or None when the log was pruned past what they have
+# seen and they must reload.
+class ChangeFeed:
+    def __init__(self):
+        self.listeners = []
+        self.last_id = None
+        self.seen_version = None
+        self.running = False
+        self.root = None
+        self.pruned_at = 0
+
+    def subscribe(self, widget, callback):
+        self.listeners.append((widget, callback))
+        if self.running:
+            return
+        self.running = True
+        self.root = widget._root()
+        if self.last_id is None:
+            cutoff = self.prune_cutoff()
+            db_tasks.run(self.root, lambda: self.start(cutoff), self.started, self.failed, cancellable=False)
+        else:
+            self.schedule()
+
+    def schedule(self):
+        self.root.after(POLL_MS, self.poll)
+
+    # The log is trimmed when the feed starts and then once an hour, so a
+    # session left running for days does not grow it without bound. None when
+    # no trim is due.
+    def prune_cutoff(self):
+        if time.time() - self.pruned_at < PRUNE_INTERVAL:
+            return None
+        self.pruned_at = time.time()
+        return int(self.pruned_at) - RETENTION
+
+    def version(self):
+        con = database.get_connection()
+        return con.execute("PRAGMA data_version").fetchone()[0], con.total_changes
+
+    # start and check run on the database thread and only read the feed's
+    # state through their arguments.
+    def start(self, cutoff):
+        repository.prune_changes(cutoff)
+        return repository.last_change_id(), self.version()
+
+    def check(self, last_id, seen_version, cutoff):
+        if cutoff is not None:
+            repository.prune_changes(cutoff)
+        version = self.version()
+        if version == seen_version:
+            return version, [], False
+        changes = repository.changes_after(last_id)
+        gap = bool(changes) and changes[0][0] > last_id + 1 and repository.first_change_id() > last_id + 1
+        return version, changes, gap
+
+    def started(self, state):
+        self.last_id, self.seen_version = state
+        self.schedule()
+
+    # A failed poll, say on a locked database, is tried again next time.
+    def failed(self, error):
+        self.schedule()
+
+    def poll(self):
+        self.listeners = [(widget, callback) for widget, callback in self.listeners if self.alive(widget)]
+        if not self.listeners:
+            self.running = False
+            return
+        last_id, seen_version, cutoff = self.last_id, self.seen_version, self.prune_cutoff()
+        db_tasks.run(self.root, lambda: self.check(last_id, seen_version, cutoff), self.dispatch, self.failed,
+                     cancellable=False)
+
+    def dispatch(self, result):
+        self.seen_version, changes, gap = result
+        self.schedule()
+        if not changes:
+            return
+        self.last_id = changes[-1][0]
+        # Keep only the latest operation per book.
+        latest = {book_id: op for _, book_id, op in changes}
+        for widget, callback in list(self.listeners):
+            try:
+                callback(None if gap else latest)
+            except tk.TclError:
+                pass
+
+    @staticmethod
+    def alive(widget):
+        try:
+            return bool(widget.winfo_exists())
+        except tk.TclError:
+            return False
+
+
+change_feed = ChangeFeed()
+
+
+# The change feed side of a screen that loads books on the database thread.
+# The navigator cancels load_task when the screen is left, so showing the
+# screen again reloads it. A feed change drops the changed books through
+# forget_books, which returns the ids to read back, and the fresh rows that
+# still match change_filters() go to show_changes. That read is not cancellable:
+# leaving the screen must not lose rows it already dropped.
+class LiveScreen:
+    load_task = None
+
+    def change_filters(self):
+        return ()
+
+    def on_show(self):
+        if self.load_task is not None and self.load_task.cancelled:
+            self.reload()
+
+    def apply_changes(self, changes):
+        if changes is None:
+            self.reload()
+            return
+        book_ids = self.forget_books(changes)
+        if book_ids:
+            filters = self.change_filters()
+            db_tasks.run(self, lambda: repository.books_by_ids(book_ids, filters),
+                         lambda books: self.show_changes(book_ids, books), cancellable=False)
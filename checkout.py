@@ -0,0 +1,63 @@
+import time
+
+from database import write_transaction
+from query_cache import query_cache
+
+LOAN_DAYS = 14
+CHECKED_OUT = "checked_out"
+CONFLICT = "conflict"
+NOT_AVAILABLE = "not_available"
+
+
+def _take(con, book_id, username, email):
+    # Only flips a copy that is still in stock; rowcount 0 means another desk
+    # got there first.
+    cursor = con.execute("UPDATE books SET is_taken = 1, who_took = ?, email = ? "
+                         "WHERE id = ? AND is_taken = 0", (username, email, book_id))
+    if cursor.rowcount != 1:
+        return False
+    now = int(time.time())
+    con.execute("INSERT INTO loans (book_id, user_id, email, checked_out_at, due_at) "
+                "VALUES (?, (SELECT id FROM userdatabase WHERE name = ?), ?, ?, ?)",
+                (book_id, username, email, now, now + LOAN_DAYS * 86400))
+    return True
+
+
+def checkout_book(book_id, username, email):
+    taken = write_transaction(lambda con: _take(con, book_id, username, email))
+    if not taken:
+        return CONFLICT
+    query_cache.books_changed([book_id])
+    return CHECKED_OUT
+
+
+# Returns every copy in one transaction; copies already back in stock are
+# skipped. Returns how many were checked in.
+def check_in_books(book_ids):
+    now = int(time.time())
+
+    def work(con):
+        returned = con.executemany("UPDATE books SET is_taken = 0, who_took = NULL, email = NULL "
+                                   "WHERE id = ? AND is_taken = 1", ((book_id,) for book_id in book_ids)).rowcount
+        con.executemany("UPDATE loans SET returned_at = ? WHERE book_id = ? AND returned_at IS NULL",
+                        ((now, book_id) for book_id in book_ids))
+        return returned
+    returned = write_transaction(work)
+    query_cache.books_changed(book_ids)
+    return returned
+
+
+# The comboboxes offer titles, so pick one available copy of the title and take
+# it in the same write transaction. Returns (status, book_id).
+def checkout_title(title, username, email):
+    def work(con):
+        row = con.execute("SELECT id FROM books WHERE is_taken = 0 AND title = ? LIMIT 1", (title,)).fetchone()
+        if row is None:
+            return NOT_AVAILABLE, None
+        if not _take(con, row[0], username, email):
+            return CONFLICT, row[0]
+        return CHECKED_OUT, row[0]
+    result, book_id = write_transaction(work)
+    if result == CHECKED_OUT:
+        query_cache.books_changed([book_id])
+    return result, book_id
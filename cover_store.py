@@ -0,0 +1,37 @@
+import hashlib
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from PIL import Image
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+STORE_DIR = "covers"
+DEFAULT_IMAGE = os.path.join(HERE, "default_image.png")
+MAX_SIZE = (500, 750)
+
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="cover-ingest")
+
+
+# Covers are copied into covers/<aa>/<bb>/<sha256>.png, named after the hash of
+# the uploaded file, so uploading the same image twice stores it once. The
+# stored copy is normalized to PNG and scaled down to MAX_SIZE; image_path in
+# the database holds this path relative to the application directory.
+def ingest(path):
+    with open(path, "rb") as file:
+        digest = hashlib.sha256(file.read()).hexdigest()
+    relative = os.path.join(STORE_DIR, digest[:2], digest[2:4], f"{digest}.png")
+    target = os.path.join(HERE, relative)
+    if not os.path.exists(target):
+        with Image.open(path) as original:
+            image = original.convert("RGBA")
+        image.thumbnail(MAX_SIZE, Image.LANCZOS)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        partial = f"{target}.{os.getpid()}.tmp"
+        image.save(partial, format="PNG", optimize=True)
+        os.replace(partial, target)
+    return relative
+
+
+def ingest_async(path):
+    return _executor.submit(ingest, path)
+
@@ -0,0 +1,484 @@
+import atexit
+import os
+import random
+import sqlite3
+import threading
+import time
+from typing import List, Optional, Tuple
+
+import schema
+from models import Book, Loan, User
+from profiling import profiler, TracingConnection
+from query_cache import query_cache, AVAILABLE, TAKEN, SEARCH, PAGES, USERS
+
+DB_PATH = os.environ.get("LIBRARY_DB", os.path.join(os.path.dirname(os.path.abspath(__file__)), "library.db"))
+BUSY_TIMEOUT = 5.0
+CACHED_STATEMENTS = 256
+RETRY_ATTEMPTS = 5
+RETRY_BACKOFF = 0.05
+RANKED_MATCHES = 2000
+SORTED_MATCHES = 3000
+
+# One connection per thread: the Tk thread gets a single long lived connection
+# and background threads get their own, all closed together on exit.
+_local = threading.local()
+_lock = threading.Lock()
+_connections = []
+_generation = 0
+_migrated_generation = None
+
+
+def _open(path):
+    factory = TracingConnection if profiler.enabled else sqlite3.Connection
+    con = sqlite3.connect(path, timeout=BUSY_TIMEOUT, cached_statements=CACHED_STATEMENTS, factory=factory)
+    con.execute("PRAGMA journal_mode = WAL")
+    con.execute(f"PRAGMA busy_timeout = {int(BUSY_TIMEOUT * 1000)}")
+    con.execute("PRAGMA synchronous = NORMAL")
+    con.execute("PRAGMA foreign_keys = ON")
+    return con
+
+
+def get_connection() -> sqlite3.Connection:
+    global _migrated_generation
+    con = getattr(_local, "connection", None)
+    if con is None or _local.generation != _generation:
+        con = _open(DB_PATH)
+        if _migrated_generation != _generation:
+            schema.migrate(con)
+            _migrated_generation = _generation
+        with _lock:
+            _connections.append(con)
+        _local.connection = con
+        _local.generation = _generation
+    return con
+
+
+def close_all():
+    global _generation
+    with _lock:
+        for con in _connections:
+            try:
+                con.close()
+            except sqlite3.Error:
+                pass
+        _connections.clear()
+        _generation += 1
+    query_cache.reset()
+
+
+def configure(path):
+    global DB_PATH
+    close_all()
+    DB_PATH = path
+
+
+atexit.register(close_all)
+
+
+def is_busy(error):
+    code = getattr(error, "sqlite_errorcode", None)
+    if code is not None:
+        return code & 0xff in (sqlite3.SQLITE_BUSY, sqlite3.SQLITE_LOCKED)
+    return "locked" in str(error) or "busy" in str(error)
+
+
+# Runs work(con) inside BEGIN IMMEDIATE, which takes the write lock up front so
+# concurrent writers queue on the busy timeout instead of failing mid
+# transaction. If the lock still cannot be had, retry with jittered backoff.
+def write_transaction(work, attempts=RETRY_ATTEMPTS):
+    con = get_connection()
+    for attempt in range(attempts):
+        try:
+            con.execute("BEGIN IMMEDIATE")
+            try:
+                result = work(con)
+            except BaseException:
+                con.rollback()
+                raise
+            con.commit()
+            return result
+        except sqlite3.OperationalError as error:
+            if not is_busy(error) or attempt == attempts - 1:
+                raise
+            time.sleep(RETRY_BACKOFF * 2 ** attempt * (0.5 + random.random()))
+
+
+EXPORT_COLUMNS = {
+    "books": ("id", "image_path", "title", "author", "genre", "language", "page", "is_taken", "who_took", "email", "row_version"),
+    "loans": ("id", "title", "is_taken", "who_took", "email", "row_version"),
+}
+
+
+# Columns in the order of Book's fields: is_taken is 0/1 and who_took/email
+# are NULL while the copy is in stock.
+BOOK_COLUMNS = "b.id, b.image_path, b.title, a.name, g.name, l.name, b.page, b.is_taken, b.who_took, b.email, b.row_version"
+LOOKUPS = {"author": ("authors", "a"), "genre": ("genres", "g"), "language": ("languages", "l")}
+BOOK_SELECT = (f"SELECT {BOOK_COLUMNS} FROM books b LEFT JOIN authors a ON a.id = b.author_id LEFT JOIN genres g ON g.id = b.genre_id "
+               "LEFT JOIN languages l ON l.id = b.language_id")
+
+# AllBooks columns (named like Book's fields) and the (expression, field)
+# pairs each sorts by. Pages continue from the sort_key() of their last row,
+# an index range scan on every column: SQLite indexes end with the rowid, and
+# availability sorts by title next to use the (is_taken, title) index.
+SORT_COLUMNS = {"id": (), "title": (("b.title", "title"),), "author": (("a.name", "author"),),
+                "genre": (("g.name", "genre"),), "language": (("l.name", "language"),), "page": (("b.page", "page"),),
+                "is_taken": (("b.is_taken", "is_taken"), ("b.title", "title")),
+                "who_took": (("b.who_took", "who_took"),), "email": (("b.email", "email"),)}
+NOT_NULL = ("id", "title", "is_taken")
+PAGE_OPERATORS = ("<", "<=", ">", ">=", "=")
+TEXT_END = "\U0010ffff"
+
+
+# Adds any new author, genre and language names to their lookup tables, then
+# inserts (image_path, title, author, genre, language, page) rows in stock.
+def insert_books(con, books):
+    books = list(books)
+    for table, column in (("authors", 2), ("genres", 3), ("languages", 4)):
+        con.executemany(f"INSERT OR IGNORE INTO {table} (name) VALUES (?)",
+                        {(book[column],) for book in books if book[column] is not None})
+    con.executemany("INSERT INTO books (image_path, title, author_id, genre_id, language_id, page) VALUES (?, ?, "
+                    "(SELECT id FROM authors WHERE name = ?), (SELECT id FROM genres WHERE name = ?), "
+                    "(SELECT id FROM languages WHERE name = ?), ?)", books)
+
+
+def match_expression(text):
+    # Every word the user typed becomes a quoted prefix term, so punctuation in
+    # titles can never be parsed as FTS5 query syntax.
+    terms = ['"' + word.replace('"', '""') + '"*' for word in text.split()]
+    return " ".join(terms)
+
+
+# Column filters as conditions on books: names compare lookup ids, who_took
+# and email match a prefix as an index range, and title and the free text
+# search go through the full-text index. With indexed=False each condition
+# is only checked row by row (a unary + keeps SQLite from driving the query
+# with its index).
+def filter_clauses(filters, indexed=True):
+    clauses, params = [], []
+    b = "b" if indexed else "+b"
+    for column, value in filters:
+        if column in ("text", "title"):
+            if not value.split():
+                continue
+            clauses.append(f"{b}.id IN (SELECT rowid FROM book_search WHERE book_search MATCH ?)")
+            params.append(match_expression(value) if column == "text" else f"title : ({match_expression(value)})")
+        elif column in LOOKUPS:
+            clauses.append(f"{b}.{column}_id = (SELECT id FROM {LOOKUPS[column][0]} WHERE name = ?)")
+            params.append(value)
+        elif column == "page":
+            for operator, number in value:
+                if operator not in PAGE_OPERATORS:
+                    raise ValueError(f"Unknown page operator: {operator}")
+                clauses.append(f"{b}.page {operator} ?")
+                params.append(number)
+        elif column == "is_taken":
+            clauses.append(f"{b}.is_taken = ?")
+            params.append(int(value))
+        elif column in ("who_took", "email"):
+            clauses.append(f"{b}.{column} >= ? AND {b}.{column} < ?")
+            params += [value, value + TEXT_END]
+        else:
+            raise ValueError(f"Unknown filter column: {column}")
+    return clauses, params
+
+
+def sort_key(book, column):
+    return tuple(getattr(book, field) for _, field in SORT_COLUMNS[column]) + (book.id,)
+
+
+# Books that have the sorted name use an inner join, which leaves SQLite free
+# to walk the lookup table's name index (rows come out in name order with no
+# sort step) or to start from a filter's index instead. Books without that
+# name are read separately.
+def sorted_select(column, present):
+    if column not in LOOKUPS or not present:
+        return BOOK_SELECT
+    table, alias = LOOKUPS[column]
+    joins = " ".join(f"LEFT JOIN {other} {other_alias} ON {other_alias}.id = b.{name}_id"
+                     for name, (other, other_alias) in LOOKUPS.items() if name != column)
+    return f"SELECT {BOOK_COLUMNS} FROM books b JOIN {table} {alias} ON {alias}.id = b.{column}_id {joins}"
+
+
+def null_check(column, present):
+    target = f"b.{column}_id" if column in LOOKUPS else SORT_COLUMNS[column][0][0]
+    return f"{target} IS NOT NULL" if present else f"{target} IS NULL"
+
+
+class LibraryRepository:
+    @property
+    def con(self) -> sqlite3.Connection:
+        return get_connection()
+
+    # Users
+    def find_user(self, name: str) -> Optional[User]:
+        return query_cache.get(self.con, ("find_user", name), (USERS, ("user", name)), lambda: self._find_user(name))
+
+    def _find_user(self, name: str) -> Optional[User]:
+        row = self.con.execute("SELECT id, name, password, isadmin FROM userdatabase WHERE name = ?", (name,)).fetchone()
+        return User(*row) if row else None
+
+    # The id is allocated by SQLite (INTEGER PRIMARY KEY) while the write lock
+    # is held, so desks signing people up at the same time never collide.
+    # Raises sqlite3.IntegrityError if the name is already taken.
+    def create_user(self, name: str, password: str, isadmin: int) -> int:
+        user_id = write_transaction(lambda con: con.execute(
+            "INSERT INTO userdatabase (name, password, isadmin) VALUES (?, ?, ?)", (name, password, isadmin)).lastrowid)
+        query_cache.invalidate(("user", name))
+        return user_id
+
+    def set_password(self, id: int, password: str):
+        with self.con:
+            self.con.execute("UPDATE userdatabase SET password = ? WHERE id = ?", (password, id))
+        query_cache.invalidate(USERS)
+
+    # Books
+    # Catalog pages, title lists and search results are served from the
+    # query cache; the write paths below and in checkout.py invalidate them.
+    def books_after(self, after_id: int, limit: int) -> List[Book]:
+        return query_cache.get(self.con, ("books_after", after_id, limit), (PAGES,), lambda: self._books_after(after_id, limit))
+
+    def _books_after(self, after_id: int, limit: int) -> List[Book]:
+        rows = self.con.execute(f"{BOOK_SELECT} WHERE b.id > ? ORDER BY b.id LIMIT ?", (after_id, limit))
+        return [Book(*row) for row in rows]
+
+    def books_before(self, before_id: int, limit: int) -> List[Book]:
+        return query_cache.get(self.con, ("books_before", before_id, limit), (PAGES,), lambda: self._books_before(before_id, limit))
+
+    def _books_before(self, before_id: int, limit: int) -> List[Book]:
+        rows = self.con.execute(f"{BOOK_SELECT} WHERE b.id < ? ORDER BY b.id DESC LIMIT ?", (before_id, limit)).fetchall()
+        return [Book(*row) for row in reversed(rows)]
+
+    # Full-text results page by the id of the edge row rather than by
+    # offset. Selective queries come in rank order; ranking scores every
+    # match, so a query matching more than RANKED_MATCHES books (a short or
+    # common word) lists its matches in id order instead.
+    def search_books(self, text: str, limit: int, after_id: Optional[int] = None, before_id: Optional[int] = None) -> List[Book]:
+        if not text.split():
+            return []
+        return query_cache.get(self.con, ("search_books", text, after_id, before_id, limit), (SEARCH,),
+                               lambda: self._search_books(text, limit, after_id, before_id))
+
+    def _search_books(self, text: str, limit: int, after_id: Optional[int], before_id: Optional[int]) -> List[Book]:
+        ranked = self.ranked_matches(text)
+        if ranked is None:
+            if before_id is not None:
+                condition, values, order = "rowid < ?", (before_id,), "DESC"
+            else:
+                condition, values, order = "rowid > ?", (after_id or 0,), "ASC"
+            ids = [row[0] for row in self.con.execute(f"SELECT rowid FROM book_search WHERE book_search MATCH ? AND {condition} "
+                                                      f"ORDER BY rowid {order} LIMIT ?", (match_expression(text),) + values + (limit,))]
+            ids.sort()
+        else:
+            # An edge row that no longer matches ends the listing.
+            edge = before_id if before_id is not None else after_id
+            if edge is not None and edge not in ranked:
+                return []
+            if before_id is not None:
+                stop = ranked.index(before_id)
+                ids = ranked[max(0, stop - limit):stop]
+            else:
+                start = ranked.index(after_id) + 1 if after_id is not None else 0
+                ids = ranked[start:start + limit]
+        if not ids:
+            return []
+        books = {book.id: book for book in self.books_by_ids(ids)}
+        return [books[book_id] for book_id in ids if book_id in books]
+
+    # Ids of the books matching text in rank order, or None when more than
+    # RANKED_MATCHES match. The match count is found without ranking.
+    def ranked_matches(self, text: str) -> Optional[List[int]]:
+        return query_cache.get(self.con, ("ranked_matches", text), (SEARCH,), lambda: self._ranked_matches(text))
+
+    def _ranked_matches(self, text: str) -> Optional[List[int]]:
+        expression = match_expression(text)
+        count = self.con.execute("SELECT COUNT(*) FROM (SELECT rowid FROM book_search WHERE book_search MATCH ? LIMIT ?)",
+                                 (expression, RANKED_MATCHES + 1)).fetchone()[0]
+        if count > RANKED_MATCHES:
+            return None
+        return [row[0] for row in self.con.execute("SELECT rowid FROM book_search WHERE book_search MATCH ? ORDER BY rank", (expression,))]
+
+    def search_titles(self, text: str, is_taken: bool, limit: int) -> List[str]:
+        if not text.split():
+            return []
+        order = "book_search.rowid" if self.ranked_matches(text) is None else "book_search.rank"
+        rows = self.con.execute("SELECT b.title FROM book_search JOIN books b ON b.id = book_search.rowid "
+                                f"WHERE book_search MATCH ? AND b.is_taken = ? ORDER BY {order} LIMIT ?",
+                                (match_expression(text), int(is_taken), limit))
+        return [row[0] for row in rows]
+
+    # A page of books matching filters ((column, value) pairs) in column
+    # order. after/before is the sort_key() of the row to continue from.
+    def sorted_books(self, column: str, descending: bool, filters: tuple, limit: int,
+                     after: Optional[tuple] = None, before: Optional[tuple] = None) -> List[Book]:
+        if before is not None:
+            return query_cache.get(self.con, ("sorted_books", column, descending, filters, "before", before, limit), (SEARCH,),
+                                   lambda: self._sorted_books(column, not descending, filters, before, limit)[::-1])
+        return query_cache.get(self.con, ("sorted_books", column, descending, filters, "after", after, limit), (SEARCH,),
+                               lambda: self._sorted_books(column, descending, filters, after, limit))
+
+    # How many books match filters, counted up to SORTED_MATCHES + 1.
+    def filter_matches(self, filters: tuple) -> int:
+        where, params = filter_clauses(filters)
+        if not where:
+            return 0
+        return query_cache.get(self.con, ("filter_matches", filters), (SEARCH,), lambda: self.con.execute(
+            f"SELECT COUNT(*) FROM (SELECT 1 FROM books b WHERE {' AND '.join(where)} LIMIT ?)",
+            params + [SORTED_MATCHES + 1]).fetchone()[0])
+
+    # NULLs sort first, as in SQLite, and are read as their own range ordered
+    # by id; a page that crosses from one range to the other takes two queries.
+    # A filter on the sorted column leaves no NULL range. Under other filters
+    # the NULL check is kept out of index selection: walking the column's NULL
+    # entries in id order reads most of the catalog when the filter is narrow.
+    def _sorted_books(self, column: str, descending: bool, filters: tuple, cursor: Optional[tuple], limit: int) -> List[Book]:
+        expressions = [expression for expression, _ in SORT_COLUMNS[column]]
+        walk = self.filter_matches(filters) > SORTED_MATCHES
+        # Only copies on loan have a borrower or e-mail, so sorting by
+        # availability under those filters walks just the copies on loan.
+        names = [name for name, _ in filters]
+        if column == "is_taken" and ("who_took" in names or "email" in names) and "is_taken" not in names:
+            filters += (("is_taken", True),)
+        # A filter on the sorted column narrows the index range being walked.
+        own = tuple((name, value) for name, value in filters if name == column and name != "title")
+        where, params = filter_clauses(own)
+        others = filter_clauses(tuple(item for item in filters if item not in own), indexed=not walk)
+        where, params = where + others[0], params + others[1]
+        direction, comparison = ("DESC", "<") if descending else ("ASC", ">")
+        nullable = column not in NOT_NULL and all(name != column for name, _ in filters)
+        if not nullable:
+            ranges = [True]
+        else:
+            ranges = [True, False] if descending else [False, True]
+            if cursor is not None:
+                ranges = ranges[ranges.index(cursor[0] is not None):]
+        books = []
+        for present in ranges:
+            clauses, values = list(where), list(params)
+            if nullable:
+                check = null_check(column, present)
+                clauses.append(f"+{check}" if where and not present and not walk else check)
+            # Rows without the value are ordered by id alone.
+            keys = (expressions if present else []) + ["b.id"]
+            if cursor is not None and (not nullable or (cursor[0] is not None) == present):
+                clauses.append(f"({', '.join(keys)}) {comparison} ({', '.join('?' * len(keys))})")
+                values += cursor[-len(keys):] if not present else cursor
+            where_sql = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+            order = ", ".join(f"{key} {direction}" for key in keys)
+            rows = self.con.execute(f"{sorted_select(column, present)}{where_sql} ORDER BY {order} LIMIT ?",
+                                    values + [limit - len(books)])
+            books += [Book(*row) for row in rows]
+            if len(books) >= limit:
+                break
+        return books
+
+    def lookup_names(self, column: str) -> List[str]:
+        return [row[0] for row in self.con.execute(f"SELECT name FROM {LOOKUPS[column][0]} ORDER BY name")]
+
+    # The books among ids that still match filters.
+    def books_by_ids(self, ids: List[int], filters: tuple = ()) -> List[Book]:
+        where, params = filter_clauses(filters)
+        clauses = [f"b.id IN ({', '.join('?' * len(ids))})"] + where
+        rows = self.con.execute(f"{BOOK_SELECT} WHERE {' AND '.join(clauses)}", list(ids) + params)
+        return [Book(*row) for row in rows]
+
+    def available_books(self) -> List[Tuple[int, str]]:
+        return query_cache.get(self.con, ("available_books",), (AVAILABLE,),
+                               lambda: self.con.execute("SELECT id, title FROM books WHERE is_taken = 0").fetchall())
+
+    def taken_books(self) -> List[Tuple[int, str]]:
+        return query_cache.get(self.con, ("taken_books",), (TAKEN,),
+                               lambda: self.con.execute("SELECT id, title FROM books WHERE is_taken = 1").fetchall())
+
+    # Change feed
+    def last_change_id(self) -> int:
+        return self.con.execute("SELECT MAX(id) FROM book_changes").fetchone()[0] or 0
+
+    def changes_after(self, change_id: int) -> List[Tuple[int, int, str]]:
+        return self.con.execute("SELECT id, book_id, op FROM book_changes WHERE id > ? ORDER BY id", (change_id,)).fetchall()
+
+    def first_change_id(self) -> int:
+        return self.con.execute("SELECT MIN(id) FROM book_changes").fetchone()[0] or 0
+
+    def prune_changes(self, older_than: int):
+        write_transaction(lambda con: con.execute("DELETE FROM book_changes WHERE changed_at < ?", (older_than,)))
+
+    def add_book(self, image_path: str, title: str, author: str, genre: str, language: str, page: str):
+        with self.con:
+            insert_books(self.con, [(image_path, title, author, genre, language, page)])
+        query_cache.books_changed((), added=True)
+
+    # Inserts a batch and records how far through the source file the import
+    # got in the same transaction, so a resumed import never double-inserts.
+    def import_books(self, source: str, books: List[tuple], rows_done: int):
+        with self.con:
+            insert_books(self.con, books)
+            self.con.execute("INSERT INTO import_progress (source, rows_done) VALUES (?, ?) "
+                             "ON CONFLICT (source) DO UPDATE SET rows_done = excluded.rows_done, updated_at = CURRENT_TIMESTAMP",
+                             (source, rows_done))
+        query_cache.books_changed((), added=True)
+
+    # Refreshes the query planner's statistics, after an import has changed
+    # the size and shape of the catalog.
+    def analyze(self):
+        self.con.execute("ANALYZE")
+
+    def import_rows_done(self, source: str) -> int:
+        row = self.con.execute("SELECT rows_done FROM import_progress WHERE source = ?", (source,)).fetchone()
+        return row[0] if row else 0
+
+    # Every insert or update stamps the row with a new row_version, which lets
+    # exports pick up only the rows that changed since the previous run.
+    def max_row_version(self) -> int:
+        return self.con.execute("SELECT MAX(row_version) FROM books").fetchone()[0] or 0
+
+    # Exports read the book_properties view, so files keep the columns and
+    # values they had before the compact layout.
+    def export_batches(self, dataset: str, since_version: int, upto_version: int, batch_size: int):
+        where = "row_version > ? AND row_version <= ?"
+        if dataset == "loans" and since_version == 0:
+            where += " AND is_taken = 'True'"
+        cursor = self.con.execute(f"SELECT {', '.join(EXPORT_COLUMNS[dataset])} FROM book_properties WHERE {where} ORDER BY row_version",
+                                  (since_version, upto_version))
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                return
+            yield rows
+
+    def exported_version(self, name: str) -> int:
+        row = self.con.execute("SELECT row_version FROM export_progress WHERE name = ?", (name,)).fetchone()
+        return row[0] if row else 0
+
+    def save_exported_version(self, name: str, row_version: int):
+        with self.con:
+            self.con.execute("INSERT INTO export_progress (name, row_version) VALUES (?, ?) "
+                             "ON CONFLICT (name) DO UPDATE SET row_version = excluded.row_version, exported_at = CURRENT_TIMESTAMP",
+                             (name, row_version))
+
+    def loans(self, text: str, limit: int, overdue_only: bool = False) -> List[Loan]:
+        pattern = f"%{text.strip()}%"
+        if overdue_only:
+            rows = self.con.execute("SELECT b.id, b.title, b.who_took, b.email FROM loans l JOIN books b ON b.id = l.book_id "
+                                    "WHERE l.returned_at IS NULL AND l.due_at < ? "
+                                    "AND (b.title LIKE ? OR b.who_took LIKE ? OR b.email LIKE ?) ORDER BY l.due_at LIMIT ?",
+                                    (int(time.time()), pattern, pattern, pattern, limit))
+        else:
+            rows = self.con.execute("SELECT id, title, who_took, email FROM books WHERE is_taken = 1 "
+                                    "AND (title LIKE ? OR who_took LIKE ? OR email LIKE ?) ORDER BY who_took, title LIMIT ?",
+                                    (pattern, pattern, pattern, limit))
+        return [Loan(*row) for row in rows]
+
+    def user_loans(self, username: str) -> List[Loan]:
+        rows = self.con.execute("SELECT b.id, b.title, u.name, l.email, a.name, l.checked_out_at, l.due_at FROM userdatabase u "
+                                "JOIN loans l ON l.user_id = u.id AND l.returned_at IS NULL "
+                                "JOIN books b ON b.id = l.book_id LEFT JOIN authors a ON a.id = b.author_id "
+                                "WHERE u.name = ? ORDER BY l.due_at",
+                                (username,))
+        return [Loan(*row) for row in rows]
+
+    def borrower_email(self, title: str) -> Optional[str]:
+        row = self.con.execute("SELECT email FROM books WHERE is_taken = 1 AND title = ? LIMIT 1", (title,)).fetchone()
+        return row[0] if row else None
+
+
+repository = LibraryRepository()
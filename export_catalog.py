@@ -0,0 +1,126 @@
+import argparse
+import csv
+import json
+import os
+import time
+from datetime import datetime
+
+import database
+from database import EXPORT_COLUMNS, repository
+
+INTEGER_COLUMNS = {"id", "page", "row_version"}
+
+
+class CsvWriter:
+    def __init__(self, path, columns):
+        self.file = open(path, "w", newline="", encoding="utf-8")
+        self.writer = csv.writer(self.file)
+        self.writer.writerow(columns)
+
+    def write(self, rows):
+        self.writer.writerows(rows)
+
+    def close(self):
+        self.file.close()
+
+
+class JsonlWriter:
+    def __init__(self, path, columns):
+        self.file = open(path, "w", encoding="utf-8")
+        self.columns = columns
+
+    def write(self, rows):
+        self.file.writelines(json.dumps(dict(zip(self.columns, row)), ensure_ascii=False) + "\n" for row in rows)
+
+    def close(self):
+        self.file.close()
+
+
+# Columnar output needs pyarrow, which the desktop app itself does not. Each
+# fetched batch becomes one row group, so memory stays bounded by the batch.
+class ParquetWriter:
+    def __init__(self, path, columns):
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError:
+            raise SystemExit("Parquet export needs pyarrow: pip install pyarrow")
+        self.pa = pyarrow
+        self.columns = columns
+        self.schema = pyarrow.schema([(column, pyarrow.int64() if column in INTEGER_COLUMNS else pyarrow.string()) for column in columns])
+        self.writer = pyarrow.parquet.ParquetWriter(path, self.schema, compression="zstd")
+
+    def write(self, rows):
+        arrays = []
+        for index, column in enumerate(self.columns):
+            values = [row[index] for row in rows]
+            if column in INTEGER_COLUMNS:
+                values = [_to_int(value) for value in values]
+            else:
+                values = [None if value is None else str(value) for value in values]
+            arrays.append(self.pa.array(values, type=self.schema.field(column).type))
+        self.writer.write_table(self.pa.Table.from_arrays(arrays, schema=self.schema))
+
+    def close(self):
+        self.writer.close()
+
+
+def _to_int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+WRITERS = {"csv": CsvWriter, "jsonl": JsonlWriter, "parquet": ParquetWriter}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export the catalog or current loans without loading them into memory.")
+    parser.add_argument("dataset", choices=sorted(EXPORT_COLUMNS))
+    parser.add_argument("--format", choices=sorted(WRITERS), default="csv")
+    parser.add_argument("--output", help="defaults to exports/<dataset>-<timestamp>.<format>")
+    parser.add_argument("--batch-size", type=int, default=5000)
+    parser.add_argument("--database", help="library database to export from (default: library.db)")
+    parser.add_argument("--incremental", action="store_true",
+                        help="only export rows changed since the last incremental run of this dataset and format")
+    args = parser.parse_args()
+
+    if args.database:
+        database.configure(args.database)
+    output = args.output or os.path.join("exports", f"{args.dataset}-{datetime.now():%Y%m%d-%H%M%S}.{args.format}")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+
+    # Rows are bounded by the version seen at the start, so a row changed while
+    # the export runs is picked up by the next incremental run instead.
+    progress_name = f"{args.dataset}:{args.format}"
+    since_version = repository.exported_version(progress_name) if args.incremental else 0
+    upto_version = repository.max_row_version()
+
+    started = time.perf_counter()
+    columns = EXPORT_COLUMNS[args.dataset]
+    partial = output + ".partial"
+    writer = WRITERS[args.format](partial, columns)
+    exported = 0
+    try:
+        for rows in repository.export_batches(args.dataset, since_version, upto_version, args.batch_size):
+            writer.write(rows)
+            exported += len(rows)
+    finally:
+        writer.close()
+    os.replace(partial, output)
+    if args.incremental:
+        repository.save_exported_version(progress_name, upto_version)
+
+    elapsed = time.perf_counter() - started
+    print(json.dumps({
+        "output": output,
+        "rows": exported,
+        "since_version": since_version,
+        "upto_version": upto_version,
+        "seconds": round(elapsed, 3),
+    }))
+
+
+if __name__ == "__main__":
+    main()
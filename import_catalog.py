@@ -0,0 +1,103 @@
+import argparse
+import csv
+import itertools
+import json
+import os
+import sys
+import time
+
+import database
+from database import repository
+
+REQUIRED_FIELDS = ("title", "author", "genre", "language", "page")
+DEFAULT_COVER = "default_image.png"
+
+
+def read_rows(path, file_format):
+    with open(path, newline="", encoding="utf-8") as file:
+        if file_format == "csv":
+            yield from csv.DictReader(file)
+        else:
+            for line in file:
+                if line.strip():
+                    yield line
+
+
+def validate(row, base_dir, with_covers):
+    if isinstance(row, str):
+        row = json.loads(row)
+    row = {key.strip().lower(): value for key, value in row.items() if key}
+    if "page" not in row and "page_count" in row:
+        row["page"] = row["page_count"]
+    for field in REQUIRED_FIELDS:
+        if not str(row.get(field) or "").strip():
+            raise ValueError(f"missing {field}")
+    page = int(row["page"])
+    if page <= 0:
+        raise ValueError("page must be positive")
+    image_path = DEFAULT_COVER
+    cover = str(row.get("cover") or row.get("image") or "").strip()
+    if cover and with_covers:
+        cover = cover if os.path.isabs(cover) else os.path.join(base_dir, cover)
+        if os.path.exists(cover):
+            import cover_store
+            image_path = cover_store.ingest(cover)
+    return (image_path, str(row["title"]).strip(), str(row["author"]).strip(), str(row["genre"]).strip(),
+            str(row["language"]).strip(), page)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import books from a CSV or JSONL supplier feed.")
+    parser.add_argument("path")
+    parser.add_argument("--format", choices=("csv", "jsonl"), help="defaults to the file extension")
+    parser.add_argument("--batch-size", type=int, default=5000)
+    parser.add_argument("--database", help="library database to import into (default: library.db)")
+    parser.add_argument("--no-covers", action="store_true", help="ignore cover columns and use the default image")
+    parser.add_argument("--restart", action="store_true", help="ignore saved progress and import from the first row")
+    args = parser.parse_args()
+
+    if args.database:
+        database.configure(args.database)
+    file_format = args.format or ("csv" if args.path.lower().endswith(".csv") else "jsonl")
+    source = os.path.abspath(args.path)
+    base_dir = os.path.dirname(source)
+
+    # Progress is the number of feed rows handled (inserted or rejected) and is
+    # committed with each batch, so rerunning after a failure resumes there.
+    rows_done = 0 if args.restart else repository.import_rows_done(source)
+    if rows_done:
+        print(f"resuming after row {rows_done}", file=sys.stderr)
+    rows = itertools.islice(read_rows(args.path, file_format), rows_done, None)
+
+    started = time.perf_counter()
+    inserted = rejected = 0
+    batch = []
+    for line_number, row in enumerate(rows, start=rows_done + 1):
+        try:
+            batch.append(validate(row, base_dir, not args.no_covers))
+        except (ValueError, TypeError, AttributeError) as error:
+            rejected += 1
+            print(f"row {line_number}: {error}", file=sys.stderr)
+        if len(batch) >= args.batch_size:
+            repository.import_books(source, batch, line_number)
+            inserted += len(batch)
+            batch = []
+            elapsed = time.perf_counter() - started
+            print(f"{line_number} rows, {inserted / elapsed:,.0f} books/s", file=sys.stderr)
+        rows_done = line_number
+    repository.import_books(source, batch, rows_done)
+    inserted += len(batch)
+    repository.analyze()
+
+    elapsed = time.perf_counter() - started
+    print(json.dumps({
+        "inserted": inserted,
+        "rejected": rejected,
+        "rows_done": rows_done,
+        "seconds": round(elapsed, 3),
+        "books_per_second": round(inserted / elapsed) if elapsed else None,
+    }))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,11 @@
 import tkinter as tk
 from tkinter import ttk, END
-from ttkbootstrap import Style
-import sqlite3
+import theme
 from tkinter.messagebox import showerror, showinfo
 
-import admin_dashboard
-import user_dashboard
+import auth
+from navigation import navigator
+from background import db_tasks
 
 class LoginScreen(tk.Toplevel):
     def __init__(self):
@@ -15,22 +15,7 @@ class LoginScreen(tk.Toplevel):
         self.username_var = tk.StringVar()
         self.password_var = tk.StringVar()
 
-        style = Style(theme='united')
-        style.master = self
-
-        # SQLite3:
-        self.con = sqlite3.connect('library.db')
-        self.cur = self.con.cursor()
-
-        self.cur.execute("SELECT name FROM userdatabase")
-        self.member_names = [row[0] for row in self.cur.fetchall()]
-
-        self.cur.execute("SELECT id FROM userdatabase")
-        self.id_numbers = [row[0] for row in self.cur.fetchall()]
-        if self.id_numbers:
-            self.last_id = self.id_numbers[-1]
-        else:
-            self.last_id = 0
+        theme.get_style()
 
         screen_width = self.winfo_screenwidth()
         screen_height = self.winfo_screenheight()
@@ -45,13 +30,11 @@ class LoginScreen(tk.Toplevel):
         self.columnconfigure((0, 1), weight=1)
         self.rowconfigure((0, 1, 3, 4), weight=1)
 
-        style.configure('Medium.TButton', font=('inconsolata', 15))
-        style.configure('Custom.TRadiobutton', font=('inconsolata', 13))
-
         self.creating_widgets()
         self.packing_widgets()
 
-        self.mainloop()
+    def on_show(self):
+        self.password_entry.delete(0, END)
 
     def creating_widgets(self):
         self.welcome_text = ttk.Label(self, text="Welcome! Please enter your user details.", font="inconsolata 18")
@@ -88,34 +71,9 @@ class LoginScreen(tk.Toplevel):
                 showerror(message="Your username can not contain uppercase letter!")
                 self.password_entry.delete(0, END)
             else:
-                if username in self.member_names:
-                    self.cur.execute("SELECT password FROM userdatabase WHERE name = ?", (username,))
-                    saved_password = self.cur.fetchall()[0][0]
-                    self.cur.execute("SELECT isadmin FROM userdatabase WHERE name = ?", (username,))
-                    adminValue = self.cur.fetchall()[0][0]
-                    if saved_password != password:
-                        showerror(message="Your password is incorrect!")
-                        self.password_entry.delete(0, END)
-                    elif adminValue == 0 and isAdmin == 1:
-                        showerror(message="You are not admin!")
-                        self.radio_button_var.set(0)
-                        self.signup_button.config(state= "enabled")
-                    else:
-                        if isAdmin == 1:
-                            self.withdraw() 
-                            add_book_window = admin_dashboard.adminDashboard(username)
-                            add_book_window.wait_window()
-                            self.deiconify()
-                        else:
-                            self.withdraw() 
-                            add_book_window = user_dashboard.userDashboard(username)
-                            add_book_window.wait_window()
-                            self.deiconify()
-                            
-                else:
-                    showerror(message="There is no user with this username!")
-                    self.username_entry.delete(0, END)
-                    self.password_entry.delete(0, END)
+                self.busy(True)
+                db_tasks.run(self, lambda: auth.authenticate(username, password),
+                             lambda outcome: self.logged_in(username, isAdmin, *outcome), self.auth_failed, cancellable=False)
         else:
             showerror(message="Please fill both username and password box!")
             self.password_entry.delete(0, END)
@@ -123,7 +81,6 @@ class LoginScreen(tk.Toplevel):
     def signup(self):
         username = self.username_var.get()
         password = self.password_var.get()
-        id = self.last_id + 1
 
         if username and password:
             if " " in username:
@@ -133,21 +90,56 @@ class LoginScreen(tk.Toplevel):
                 showerror(message="Your username can not contain uppercase letter!")
                 self.password_entry.delete(0, END)
             else:
-                if username not in self.member_names:
-                    self.cur.execute('INSERT INTO userdatabase (id, name, password, isadmin) VALUES (?, ?, ?, ?)', (id, username, password, self.radio_button_var.get()))
-                    self.con.commit()
-                    showinfo(message=f"Your account has been created! \n \n Your Username: {username} \n \n Your ID: {id}")
-                    self.password_entry.delete(0, END)
-                    self.cur.execute("SELECT name FROM userdatabase")
-                    self.member_names = [row[0] for row in self.cur.fetchall()]
-                else:
-                    showerror(message="This username is already in the system!")
-                    self.username_entry.delete(0, END)
-                    self.password_entry.delete(0, END)
+                isAdmin = self.radio_button_var.get()
+                self.busy(True)
+                db_tasks.run(self, lambda: auth.register(username, password, isAdmin),
+                             lambda id: self.signed_up(username, id), self.auth_failed, cancellable=False)
         else:
             showerror(message="Please fill both username and password box!")
             self.password_entry.delete(0, END)
 
+    # Password hashing takes a noticeable moment, so it runs on the database
+    # thread with the buttons disabled.
+    def busy(self, busy):
+        self.config(cursor="watch" if busy else "")
+        self.login_button.config(state="disabled" if busy else "normal")
+        if busy or self.radio_button_var.get() == 0:
+            self.signup_button.config(state="disabled" if busy else "normal")
+
+    def logged_in(self, username, isAdmin, result, adminValue):
+        self.busy(False)
+        if result != auth.UNKNOWN_USER:
+            if result == auth.WRONG_PASSWORD:
+                showerror(message="Your password is incorrect!")
+                self.password_entry.delete(0, END)
+            elif adminValue == 0 and isAdmin == 1:
+                showerror(message="You are not admin!")
+                self.radio_button_var.set(0)
+                self.signup_button.config(state= "enabled")
+            else:
+                if isAdmin == 1:
+                    navigator.push("admin_dashboard", username)
+                else:
+                    navigator.push("user_dashboard", username)
+        else:
+            showerror(message="There is no user with this username!")
+            self.username_entry.delete(0, END)
+            self.password_entry.delete(0, END)
+
+    def signed_up(self, username, id):
+        self.busy(False)
+        if id is not None:
+            showinfo(message=f"Your account has been created! \n \n Your Username: {username} \n \n Your ID: {id}")
+            self.password_entry.delete(0, END)
+        else:
+            showerror(message="This username is already in the system!")
+            self.username_entry.delete(0, END)
+            self.password_entry.delete(0, END)
+
+    def auth_failed(self, error):
+        self.busy(False)
+        showerror(message=f"Something went wrong: {error}")
+
     def for_radio_buttons(self):
         if self.radio_button_var.get() == 1:
             self.signup_button.config(state="disabled")
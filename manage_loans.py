@@ -0,0 +1,183 @@
+import tkinter as tk
+from tkinter import ttk
+from tkinter.messagebox import showerror, showinfo
+import theme
+from models import Loan
+import checkout
+import outbox
+from database import repository
+from navigation import navigator
+from change_feed import LiveScreen, change_feed
+from background import db_tasks
+
+LOAN_LIMIT = 2000
+FILTER_DELAY_MS = 250
+
+
+class ManageLoans(LiveScreen, tk.Toplevel):
+    def __init__(self, username):
+        super().__init__()
+
+        theme.get_style()
+
+        self.username = username
+        self.filter_job = None
+        self.load_task = None
+        self.loans = {}
+        self.filter_str = tk.StringVar()
+        self.overdue_var = tk.BooleanVar(value=False)
+
+        screen_width = self.winfo_screenwidth()
+        screen_height = self.winfo_screenheight()
+        width = 900
+        height = 500
+        x = (screen_width - width) // 2
+        y = (screen_height - height) // 2 - 100
+        self.geometry(f"{width}x{height}+{x}+{y}")
+        self.title("Manage Loans")
+        self.resizable(False, False)
+
+        self.rowconfigure(1, weight=1)
+        self.columnconfigure((0, 1, 2, 3), weight=1)
+
+        self.creating_widgets()
+        self.packing_widgets()
+        self.getting_loans()
+        change_feed.subscribe(self, self.apply_changes)
+
+    def creating_widgets(self):
+        self.filter_label = ttk.Label(self, text="Filter by title, borrower or e-mail:", font="inconsolata 13")
+        self.filter_entry = ttk.Entry(self, textvariable=self.filter_str)
+        self.filter_str.trace_add("write", lambda *args: self.schedule_filter())
+        self.overdue_check = ttk.Checkbutton(self, text="Overdue only", variable=self.overdue_var, command=self.getting_loans)
+
+        self.table_frame = ttk.Frame(self)
+        self.table = ttk.Treeview(self.table_frame, columns=("Title", "Borrower", "E-Mail"), show="headings", selectmode="extended")
+        self.table.heading("Title", text="Title")
+        self.table.heading("Borrower", text="Borrower")
+        self.table.heading("E-Mail", text="E-Mail")
+        self.table.column("Title", width=400, anchor="center")
+        self.table.column("Borrower", width=180, anchor="center")
+        self.table.column("E-Mail", width=280, anchor="center")
+        self.scrollbar = ttk.Scrollbar(self.table_frame, orient="vertical", command=self.table.yview)
+        self.table.configure(yscrollcommand=self.scrollbar.set)
+
+        self.count_label = ttk.Label(self, font="inconsolata 12")
+        self.select_all_button = ttk.Button(self, text="Select All", command=self.select_all, style="Small.TButton")
+        self.recall_button = ttk.Button(self, text="Recall Selected", command=self.recall_selected, style="Small.TButton")
+        self.check_in_button = ttk.Button(self, text="Check In Selected", command=self.check_in_selected, style="Small.TButton")
+        self.previous_menu_button = ttk.Button(self, text="Previous Menu", command=self.previous_menu, style="Small.TButton")
+
+    def packing_widgets(self):
+        self.filter_label.grid(row=0, column=0, padx=10, pady=10, sticky="w")
+        self.filter_entry.grid(row=0, column=1, padx=10, sticky="we")
+        self.overdue_check.grid(row=0, column=2, padx=10)
+        self.count_label.grid(row=0, column=3, padx=10)
+        self.table_frame.grid(row=1, column=0, columnspan=4, sticky="nsew", padx=10)
+        self.scrollbar.pack(side="right", fill="y")
+        self.table.pack(expand=True, fill="both")
+        self.select_all_button.grid(row=2, column=0, pady=10)
+        self.recall_button.grid(row=2, column=1, pady=10)
+        self.check_in_button.grid(row=2, column=2, pady=10)
+        self.previous_menu_button.grid(row=2, column=3, pady=10)
+
+    def schedule_filter(self):
+        if self.filter_job is not None:
+            self.after_cancel(self.filter_job)
+        self.filter_job = self.after(FILTER_DELAY_MS, self.getting_loans)
+
+    def getting_loans(self):
+        self.filter_job = None
+        if self.load_task is not None:
+            self.load_task.cancel()
+        text, overdue = self.filter_str.get(), self.overdue_var.get()
+        self.count_label.config(text="Loading...")
+        self.load_task = db_tasks.run(self, lambda: repository.loans(text, LOAN_LIMIT, overdue), self.show_loans)
+
+    def show_loans(self, rows):
+        self.load_task = None
+        self.loans = {str(loan.book_id): loan for loan in rows}
+        self.table.delete(*self.table.get_children())
+        for loan in rows:
+            self.table.insert('', 'end', iid=str(loan.book_id), values=self.loan_values(loan))
+        more = "+" if len(rows) == LOAN_LIMIT else ""
+        self.count_label.config(text=f"{len(rows)}{more} loans")
+
+    def reload(self):
+        self.getting_loans()
+
+    # Returned books leave the list and changed loans are redrawn in place;
+    # new loans are appended when they match the current filter. Whether a
+    # loan is overdue is only known to the query, so that list is reloaded.
+    def forget_books(self, changes):
+        if self.overdue_var.get():
+            self.getting_loans()
+            return []
+        for book_id in changes:
+            if self.table.exists(str(book_id)):
+                self.table.delete(str(book_id))
+            self.loans.pop(str(book_id), None)
+        return list(changes)
+
+    def show_changes(self, book_ids, books):
+        text = self.filter_str.get().strip().lower()
+        for book in books:
+            if not book.is_taken:
+                continue
+            loan = Loan(book.id, book.title, book.who_took, book.email)
+            if text and not any(text in (value or "").lower() for value in (loan.title, loan.borrower, loan.email)):
+                continue
+            if self.table.exists(str(book.id)):
+                continue
+            self.loans[str(book.id)] = loan
+            self.table.insert('', 'end', iid=str(book.id), values=self.loan_values(loan))
+
+    def loan_values(self, loan):
+        return (loan.title, loan.borrower or "", loan.email or "-")
+
+    def select_all(self):
+        self.table.selection_set(self.table.get_children())
+
+    def selected_loans(self):
+        return [self.loans[iid] for iid in self.table.selection()]
+
+    # One e-mail per borrower listing all of their selected books, queued in a
+    # single transaction.
+    def recall_selected(self):
+        loans = self.selected_loans()
+        if not loans:
+            showerror(message="Please select the loans to recall!")
+            return
+        borrowers = {}
+        for loan in loans:
+            if loan.email:
+                borrowers.setdefault((loan.email, loan.borrower), []).append(loan.title)
+        messages = []
+        for (email, borrower), titles in borrowers.items():
+            listing = "\n".join(f"  - {title}" for title in titles)
+            messages.append((email, f"Please return {len(titles)} library book(s)",
+                             f"Hello {borrower},\n\nThe library needs these books back:\n{listing}\n\nPlease return them as soon as possible.\n\n{self.username}"))
+        db_tasks.run(self, lambda: outbox.queue_emails(messages),
+                     lambda _: showinfo(message=f"{len(messages)} e-mails have been queued for {len(loans)} books."),
+                     lambda error: showerror(message=f"The e-mails could not be queued: {error}"), cancellable=False)
+
+    def check_in_selected(self):
+        loans = self.selected_loans()
+        if not loans:
+            showerror(message="Please select the loans to check in!")
+            return
+        self.check_in_button.config(state="disabled")
+        db_tasks.run(self, lambda: checkout.check_in_books([loan.book_id for loan in loans]), self.checked_in,
+                     self.check_in_failed, cancellable=False)
+
+    def checked_in(self, returned):
+        self.check_in_button.config(state="normal")
+        showinfo(message=f"{returned} books have been checked in.")
+        self.getting_loans()
+
+    def check_in_failed(self, error):
+        self.check_in_button.config(state="normal")
+        showerror(message=f"The books could not be checked in: {error}")
+
+    def previous_menu(self):
+        navigator.back()
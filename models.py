@@ -0,0 +1,59 @@
+IN_STOCK = "In the Stock!"
+NO_EMAIL = "-"
+
+
+# Records use __slots__, so a row costs its attribute pointers and no
+# per-instance __dict__.
+class Book:
+    __slots__ = ("id", "image_path", "title", "author", "genre", "language", "page", "is_taken", "who_took", "email", "row_version")
+
+    def __init__(self, id, image_path, title, author, genre, language, page, is_taken, who_took, email, row_version):
+        self.id = id
+        self.image_path = image_path
+        self.title = title
+        self.author = author
+        self.genre = genre
+        self.language = language
+        self.page = page
+        self.is_taken = bool(is_taken)
+        self.who_took = who_took
+        self.email = email
+        self.row_version = row_version
+
+    def __repr__(self):
+        return f"Book({self.id}, {self.title!r})"
+
+    # The values shown in the AllBooks table, with the labels the library
+    # has always used for copies in stock.
+    def display_values(self):
+        return (self.title, self.author, self.genre, self.language, self.page,
+                "True" if self.is_taken else "False", self.who_took or IN_STOCK, self.email or NO_EMAIL)
+
+
+class User:
+    __slots__ = ("id", "name", "password", "isadmin")
+
+    def __init__(self, id, name, password, isadmin):
+        self.id = id
+        self.name = name
+        self.password = password
+        self.isadmin = isadmin
+
+    def __repr__(self):
+        return f"User({self.id}, {self.name!r})"
+
+
+class Loan:
+    __slots__ = ("book_id", "title", "borrower", "email", "author", "checked_out_at", "due_at")
+
+    def __init__(self, book_id, title, borrower, email, author=None, checked_out_at=None, due_at=None):
+        self.book_id = book_id
+        self.title = title
+        self.borrower = borrower
+        self.email = email
+        self.author = author
+        self.checked_out_at = checked_out_at
+        self.due_at = due_at
+
+    def __repr__(self):
+        return f"Loan({self.book_id}, {self.title!r}, {self.borrower!r})"
@@ -0,0 +1,98 @@
+import importlib
+from collections import OrderedDict
+
+from profiling import profiler
+from background import cancel_all
+
+# Screen name -> (module, class). Modules are imported the first time the
+# screen is opened so screens never have to import each other.
+SCREENS = {
+    "login": ("login_screen", "LoginScreen"),
+    "admin_dashboard": ("admin_dashboard", "adminDashboard"),
+    "user_dashboard": ("user_dashboard", "userDashboard"),
+    "add_book": ("add_book", "addBook"),
+    "all_books": ("all_books", "AllBooks"),
+    "request_book": ("request_book", "RequestBook"),
+    "request_book_back": ("request_book_back", "RequestBookBack"),
+    "manage_loans": ("manage_loans", "ManageLoans"),
+    "my_books": ("my_books", "MyBooks"),
+    "profiler_stats": ("profiler_stats", "ProfilerStats"),
+}
+CACHE_SIZE = 4
+
+
+class Navigator:
+    def __init__(self):
+        self.root = None
+        self.stack = []
+        self.screens = OrderedDict()
+
+    def start(self, root, name, *args):
+        self.root = root
+        self.push(name, *args)
+        root.mainloop()
+
+    @property
+    def current(self):
+        return self.screens.get(self.stack[-1]) if self.stack else None
+
+    # Leaving a screen cancels the loads it still has running.
+    def leave_current(self):
+        cancel_all(self.current)
+        self.current.withdraw()
+
+    def push(self, name, *args):
+        if self.current is not None:
+            self.leave_current()
+        self.stack.append((name,) + args)
+        self.show(self.stack[-1])
+
+    def back(self):
+        if len(self.stack) < 2:
+            return
+        self.leave_current()
+        self.stack.pop()
+        self.show(self.stack[-1])
+
+    # Going back to the login screen forgets everything the session opened.
+    def log_out(self):
+        self.stack = self.stack[:1]
+        for key in list(self.screens):
+            if key != self.stack[0]:
+                self.discard(key)
+        self.show(self.stack[0])
+
+    def show(self, key):
+        screen = self.screens.get(key)
+        if screen is None:
+            module_name, class_name = SCREENS[key[0]]
+            screen_class = getattr(importlib.import_module(module_name), class_name)
+            if profiler.enabled:
+                profiler.instrument_screen(screen_class)
+                with profiler.span("screen", f"{class_name}.__init__"):
+                    screen = screen_class(*key[1:])
+            else:
+                screen = screen_class(*key[1:])
+            screen.protocol("WM_DELETE_WINDOW", self.quit)
+            self.screens[key] = screen
+        else:
+            self.screens.move_to_end(key)
+            screen.deiconify()
+            if hasattr(screen, "on_show"):
+                screen.on_show()
+        self.evict()
+
+    def evict(self):
+        while len(self.screens) > CACHE_SIZE:
+            self.discard(next(iter(self.screens)))
+
+    def discard(self, key):
+        screen = self.screens.pop(key)
+        cancel_all(screen)
+        screen.destroy()
+
+    def quit(self):
+        self.root.destroy()
+
+
+navigator = Navigator()
@@ -0,0 +1,170 @@
+import argparse
+import json
+import os
+import smtplib
+import threading
+import time
+from email.message import EmailMessage
+
+import database
+from database import write_transaction
+
+SMTP_HOST = os.environ.get("LIBRARY_SMTP_HOST", "")
+SMTP_PORT = int(os.environ.get("LIBRARY_SMTP_PORT", "587"))
+SMTP_USER = os.environ.get("LIBRARY_SMTP_USER", "")
+SMTP_PASSWORD = os.environ.get("LIBRARY_SMTP_PASSWORD", "")
+SMTP_STARTTLS = os.environ.get("LIBRARY_SMTP_STARTTLS", "1") == "1"
+SENDER = os.environ.get("LIBRARY_SMTP_SENDER", "library@localhost")
+
+BATCH_SIZE = 50
+MAX_ATTEMPTS = 6
+RETRY_BASE = 30.0
+LEASE = 300.0
+IDLE_POLL = 30.0
+
+
+def queue_email(recipient, subject, body):
+    message_id = write_transaction(lambda con: con.execute(
+        "INSERT INTO outbox (recipient, subject, body) VALUES (?, ?, ?)", (recipient, subject, body)).lastrowid)
+    ensure_dispatcher()
+    return message_id
+
+
+def queue_emails(messages):
+    write_transaction(lambda con: con.executemany(
+        "INSERT INTO outbox (recipient, subject, body) VALUES (?, ?, ?)", messages))
+    ensure_dispatcher()
+
+
+def claim_due(limit):
+    # Claiming pushes next_attempt_at one lease into the future, so another
+    # terminal's dispatcher skips these rows, and a dispatcher that dies while
+    # sending simply lets the lease run out and the rows become due again.
+    now = time.time()
+
+    def work(con):
+        rows = con.execute("SELECT id, recipient, subject, body, attempts FROM outbox "
+                           "WHERE status = 'pending' AND next_attempt_at <= ? ORDER BY id LIMIT ?", (now, limit)).fetchall()
+        con.executemany("UPDATE outbox SET next_attempt_at = ? WHERE id = ?", ((now + LEASE, row[0]) for row in rows))
+        return rows
+    return write_transaction(work)
+
+
+def mark_sent(message_id):
+    write_transaction(lambda con: con.execute(
+        "UPDATE outbox SET status = 'sent', attempts = attempts + 1, sent_at = CURRENT_TIMESTAMP, last_error = NULL WHERE id = ?",
+        (message_id,)))
+
+
+def mark_failed(message_id, attempts, error):
+    status = "failed" if attempts + 1 >= MAX_ATTEMPTS else "pending"
+    retry_at = time.time() + RETRY_BASE * 2 ** attempts
+    write_transaction(lambda con: con.execute(
+        "UPDATE outbox SET status = ?, attempts = attempts + 1, next_attempt_at = ?, last_error = ? WHERE id = ?",
+        (status, retry_at, str(error)[:500], message_id)))
+
+
+class OutboxDispatcher(threading.Thread):
+    def __init__(self, host=SMTP_HOST, port=SMTP_PORT, user=SMTP_USER, password=SMTP_PASSWORD, starttls=SMTP_STARTTLS, sender=SENDER):
+        super().__init__(name="outbox", daemon=True)
+        self.host = host
+        self.port = port
+        self.user = user
+        self.password = password
+        self.starttls = starttls
+        self.sender = sender
+        self.smtp = None
+        self.wakeup = threading.Event()
+        self.stopping = False
+
+    def run(self):
+        while not self.stopping:
+            sent = self.dispatch_once()
+            if not sent:
+                self.close()
+                self.wakeup.wait(IDLE_POLL)
+                self.wakeup.clear()
+        self.close()
+
+    # Sends one batch of due messages over a single SMTP connection, which is
+    # kept open while there is more work. Returns how many were handled.
+    def dispatch_once(self):
+        rows = claim_due(BATCH_SIZE)
+        for message_id, recipient, subject, body, attempts in rows:
+            message = EmailMessage()
+            message["From"] = self.sender
+            message["To"] = recipient
+            message["Subject"] = subject
+            message.set_content(body)
+            try:
+                self.connect().send_message(message)
+            except (smtplib.SMTPException, OSError) as error:
+                self.close()
+                mark_failed(message_id, attempts, error)
+            else:
+                mark_sent(message_id)
+        return len(rows)
+
+    def connect(self):
+        if self.smtp is None:
+            smtp = smtplib.SMTP(self.host, self.port, timeout=30)
+            if self.starttls:
+                smtp.starttls()
+            if self.user:
+                smtp.login(self.user, self.password)
+            self.smtp = smtp
+        return self.smtp
+
+    def close(self):
+        if self.smtp is not None:
+            try:
+                self.smtp.quit()
+            except (smtplib.SMTPException, OSError):
+                pass
+            self.smtp = None
+
+    def stop(self):
+        self.stopping = True
+        self.wakeup.set()
+
+
+_dispatcher = None
+
+
+# Without LIBRARY_SMTP_HOST nothing is sent; messages wait in the outbox.
+def ensure_dispatcher():
+    global _dispatcher
+    if not SMTP_HOST:
+        return None
+    if _dispatcher is None or not _dispatcher.is_alive():
+        _dispatcher = OutboxDispatcher()
+        _dispatcher.start()
+    else:
+        _dispatcher.wakeup.set()
+    return _dispatcher
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Send every due message in the outbox once and exit.")
+    parser.add_argument("--host", default=SMTP_HOST or "localhost")
+    parser.add_argument("--port", type=int, default=SMTP_PORT)
+    parser.add_argument("--no-starttls", action="store_true")
+    parser.add_argument("--database", help="library database to use (default: library.db)")
+    args = parser.parse_args()
+
+    if args.database:
+        database.configure(args.database)
+    dispatcher = OutboxDispatcher(host=args.host, port=args.port, starttls=SMTP_STARTTLS and not args.no_starttls)
+    handled = 0
+    while True:
+        count = dispatcher.dispatch_once()
+        if not count:
+            break
+        handled += count
+    dispatcher.close()
+    counts = dict(database.get_connection().execute("SELECT status, COUNT(*) FROM outbox GROUP BY status").fetchall())
+    print(json.dumps({"handled": handled, "outbox": counts}))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+import tkinter as tk
+from tkinter import ttk
+from tkinter.filedialog import asksaveasfilename
+from tkinter.messagebox import showinfo
+import theme
+from profiling import profiler, STATS_WINDOW
+from navigation import navigator
+
+REFRESH_MS = 1000
+ROW_LIMIT = 200
+
+
+class ProfilerStats(tk.Toplevel):
+    def __init__(self, username):
+        super().__init__()
+
+        theme.get_style()
+
+        self.username = username
+        self.refresh_job = None
+
+        screen_width = self.winfo_screenwidth()
+        screen_height = self.winfo_screenheight()
+        width = 1100
+        height = 500
+        x = (screen_width - width) // 2
+        y = (screen_height - height) // 2 - 100
+        self.geometry(f"{width}x{height}+{x}+{y}")
+        self.title("Performance Stats")
+        self.resizable(False, False)
+        self.columnconfigure((0, 1), weight= 1)
+        self.rowconfigure(1, weight= 1)
+
+        self.creating_widgets()
+        self.packing_widgets()
+        self.refresh()
+
+    def on_show(self):
+        self.refresh()
+
+    def creating_widgets(self):
+        self.top_label = ttk.Label(self, text= f"Slowest operations over their last {STATS_WINDOW} calls", font="inconsolata 18")
+        self.table_frame = ttk.Frame(self)
+        self.table = ttk.Treeview(self.table_frame, columns=("Kind", "Operation", "Count", "Mean ms", "p95 ms", "Max ms"), show="headings")
+        for column, width in (("Kind", 70), ("Operation", 670), ("Count", 70), ("Mean ms", 90), ("p95 ms", 90), ("Max ms", 90)):
+            self.table.heading(column, text= column)
+            self.table.column(column, width= width, anchor= "w" if column == "Operation" else "center")
+        self.scrollbar = ttk.Scrollbar(self.table_frame, orient="vertical", command=self.table.yview)
+        self.table.configure(yscrollcommand=self.scrollbar.set)
+        self.save_button = ttk.Button(self, text= "Save Trace", command= self.save_trace, style= "Small.TButton")
+        self.previous_menu_button = ttk.Button(self, text= "Previous Menu", command= self.previous_menu, style= "Small.TButton")
+
+    def packing_widgets(self):
+        self.top_label.grid(row = 0, column= 0, columnspan= 2, pady= 10)
+        self.table_frame.grid(row = 1, column= 0, columnspan= 2, sticky= "nsew", padx= 10)
+        self.scrollbar.pack(side="right", fill="y")
+        self.table.pack(expand=True, fill="both")
+        self.save_button.grid(row = 2, column= 0, pady= 10)
+        self.previous_menu_button.grid(row = 2, column= 1, pady= 10)
+
+    # Redraws while the panel is on screen and stops once it is hidden.
+    def refresh(self):
+        if self.refresh_job is not None:
+            self.after_cancel(self.refresh_job)
+            self.refresh_job = None
+        if self.state() == "withdrawn":
+            return
+        self.table.delete(*self.table.get_children())
+        for category, name, count, mean, p95, longest in profiler.summary()[:ROW_LIMIT]:
+            self.table.insert('', 'end', values=(category, name, count, f"{mean:.2f}", f"{p95:.2f}", f"{longest:.2f}"))
+        self.refresh_job = self.after(REFRESH_MS, self.refresh)
+
+    def save_trace(self):
+        path = asksaveasfilename(defaultextension=".json", initialfile="trace.json", filetypes=[("Chrome trace", "*.json")])
+        if path:
+            profiler.save(path)
+            showinfo(message= f"Trace saved to {path}. Open it in ui.perfetto.dev or chrome://tracing.")
+
+    def previous_menu(self):
+        navigator.back()
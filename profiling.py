@@ -0,0 +1,225 @@
+import atexit
+import json
+import math
+import os
+import re
+import sqlite3
+import statistics
+import threading
+import time
+import tkinter
+from collections import deque
+from functools import wraps
+
+STATS_WINDOW = 200
+MAX_TRACE_EVENTS = 500_000
+SQL_NAME_LENGTH = 120
+SCREEN_METHODS = ("creating_widgets", "packing_widgets", "creating_table", "packing_table")
+
+
+# Opt-in instrumentation, switched on with LIBRARY_PROFILE=trace.json or
+# `python start.py --profile trace.json`. Every SQL statement, screen build and
+# Tk callback becomes a complete ("X") event in a Chrome trace written on exit,
+# which chrome://tracing and ui.perfetto.dev open directly, and the last
+# STATS_WINDOW durations of each are kept for the admin stats panel.
+class Profiler:
+    def __init__(self):
+        self.enabled = False
+        self.path = None
+        self.lock = threading.Lock()
+        self.events = []
+        self.dropped = 0
+        self.stats = {}
+        self.origin = time.perf_counter()
+
+    def enable(self, path):
+        self.path = path
+        if self.enabled:
+            return
+        self.enabled = True
+        tkinter.CallWrapper = TimedCallWrapper
+        atexit.register(self.save)
+
+    def record(self, category, name, started, duration, args=None):
+        event = {"name": name, "cat": category, "ph": "X", "pid": os.getpid(), "tid": threading.get_ident(),
+                 "ts": round((started - self.origin) * 1e6, 1), "dur": round(duration * 1e6, 1)}
+        if args:
+            event["args"] = args
+        with self.lock:
+            if len(self.events) < MAX_TRACE_EVENTS:
+                self.events.append(event)
+            else:
+                self.dropped += 1
+            samples = self.stats.get((category, name))
+            if samples is None:
+                samples = self.stats[(category, name)] = deque(maxlen=STATS_WINDOW)
+            samples.append(duration * 1000)
+
+    def span(self, category, name):
+        return Span(self, category, name)
+
+    # Wraps the widget-building methods of a screen class once, so each call
+    # shows up nested inside the constructor's span.
+    def instrument_screen(self, screen_class):
+        for method_name in SCREEN_METHODS:
+            method = screen_class.__dict__.get(method_name)
+            if method is None or getattr(method, "profiled", False):
+                continue
+            setattr(screen_class, method_name, self.timed(method, "screen", f"{screen_class.__name__}.{method_name}"))
+
+    def timed(self, function, category, name):
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            with self.span(category, name):
+                return function(*args, **kwargs)
+        wrapper.profiled = True
+        return wrapper
+
+    # (category, name, count, mean ms, p95 ms, max ms) over the rolling window,
+    # slowest mean first.
+    def summary(self):
+        with self.lock:
+            windows = [(key, list(samples)) for key, samples in self.stats.items()]
+        rows = []
+        for (category, name), samples in windows:
+            samples.sort()
+            rows.append((category, name, len(samples), statistics.fmean(samples),
+                         percentile(samples, 0.95), samples[-1]))
+        rows.sort(key=lambda row: row[3], reverse=True)
+        return rows
+
+    def save(self, path=None):
+        path = path or self.path
+        if not path:
+            return None
+        with self.lock:
+            trace = {"traceEvents": list(self.events), "displayTimeUnit": "ms",
+                     "otherData": {"dropped_events": self.dropped}}
+        with open(path, "w", encoding="utf-8") as file:
+            json.dump(trace, file)
+        return path
+
+
+# Nearest-rank percentile of sorted samples: the smallest sample with at
+# least q of the samples at or below it.
+def percentile(samples, q):
+    return samples[max(0, math.ceil(q * len(samples)) - 1)]
+
+
+class Span:
+    def __init__(self, profiler, category, name):
+        self.profiler = profiler
+        self.category = category
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.profiler.record(self.category, self.name, self.started, time.perf_counter() - self.started)
+
+
+def sql_name(sql):
+    return re.sub(r"\s+", " ", sql).strip()[:SQL_NAME_LENGTH]
+
+
+# A statement's event covers executing it plus fetching its rows, and is
+# recorded once the rows have been read: after fetchone/fetchall, a short
+# fetchmany, iterating to the end, on close or the next execute on the
+# same cursor, or once an abandoned cursor is garbage collected.
+class TracingCursor(sqlite3.Cursor):
+    pending = None
+
+    def execute(self, sql, parameters=()):
+        self.finish()
+        started = time.perf_counter()
+        super().execute(sql, parameters)
+        self.begin(sql, started)
+        return self
+
+    def executemany(self, sql, seq_of_parameters):
+        self.finish()
+        started = time.perf_counter()
+        super().executemany(sql, seq_of_parameters)
+        self.begin(sql, started)
+        return self
+
+    def begin(self, sql, started):
+        self.pending = [sql, started, time.perf_counter() - started, 0]
+        if self.description is None:
+            self.finish(self.rowcount)
+
+    def fetchone(self):
+        started = time.perf_counter()
+        row = super().fetchone()
+        self.fetched(started, 0 if row is None else 1, True)
+        return row
+
+    def fetchmany(self, size=None):
+        started = time.perf_counter()
+        rows = super().fetchmany(self.arraysize if size is None else size)
+        self.fetched(started, len(rows), len(rows) < (self.arraysize if size is None else size))
+        return rows
+
+    def fetchall(self):
+        started = time.perf_counter()
+        rows = super().fetchall()
+        self.fetched(started, len(rows), True)
+        return rows
+
+    def __next__(self):
+        started = time.perf_counter()
+        try:
+            row = super().__next__()
+        except StopIteration:
+            self.fetched(started, 0, True)
+            raise
+        self.fetched(started, 1, False)
+        return row
+
+    def close(self):
+        self.finish()
+        super().close()
+
+    def __del__(self):
+        self.finish()
+
+    def fetched(self, started, rows, done):
+        if self.pending is None:
+            return
+        self.pending[2] += time.perf_counter() - started
+        self.pending[3] += rows
+        if done:
+            self.finish()
+
+    def finish(self, rows=None):
+        if self.pending is None:
+            return
+        sql, started, duration, fetched = self.pending
+        self.pending = None
+        profiler.record("sql", sql_name(sql), started, duration, {"sql": sql, "rows": fetched if rows is None else rows})
+
+
+class TracingConnection(sqlite3.Connection):
+    def execute(self, sql, parameters=()):
+        return self.cursor(TracingCursor).execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor(TracingCursor).executemany(sql, seq_of_parameters)
+
+
+# tkinter wraps every Python command, binding and after() callback in a
+# CallWrapper, so replacing it times all event handlers.
+class TimedCallWrapper(tkinter.CallWrapper):
+    def __call__(self, *args):
+        started = time.perf_counter()
+        try:
+            return super().__call__(*args)
+        finally:
+            profiler.record("tk", getattr(self.func, "__qualname__", repr(self.func)), started, time.perf_counter() - started)
+
+
+profiler = Profiler()
+if os.environ.get("LIBRARY_PROFILE"):
+    profiler.enable(os.environ["LIBRARY_PROFILE"])
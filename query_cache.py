@@ -0,0 +1,109 @@
+import threading
+from collections import OrderedDict
+
+MAX_ENTRIES = 64
+MAX_ROWS = 250_000
+
+# Tags that every catalog write touches.
+AVAILABLE = "available"
+TAKEN = "taken"
+SEARCH = "search"
+PAGES = "pages"
+USERS = "users"
+
+
+# Process-wide LRU cache for read models (title lists, catalog pages, user
+# lookups). Each entry carries tags and the write paths drop exactly the tags
+# they affect. Commits from other connections (another terminal, a background
+# thread) are noticed through PRAGMA data_version and clear everything, since
+# there is no telling what they changed. Cached values are shared: callers
+# must copy before modifying them.
+class QueryCache:
+    def __init__(self, max_entries=MAX_ENTRIES, max_rows=MAX_ROWS):
+        self.max_entries = max_entries
+        self.max_rows = max_rows
+        self.entries = OrderedDict()
+        self.rows = 0
+        self.versions = {}
+        # Bumped by every invalidation, so a value loaded while a write
+        # invalidated its entry is not stored.
+        self.generation = 0
+        self.lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, con, key, tags, load):
+        with self.lock:
+            self.check_version(con)
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+            generation = self.generation
+        value = load()
+        size = len(value) if isinstance(value, (list, tuple)) else 1
+        with self.lock:
+            if generation == self.generation and size <= self.max_rows:
+                self.store(key, value, frozenset(tags), size)
+        return value
+
+    def store(self, key, value, tags, size):
+        old = self.entries.pop(key, None)
+        if old is not None:
+            self.rows -= old[2]
+        self.entries[key] = (value, tags, size)
+        self.rows += size
+        while len(self.entries) > self.max_entries or self.rows > self.max_rows:
+            _, (_, _, evicted) = self.entries.popitem(last=False)
+            self.rows -= evicted
+
+    def check_version(self, con):
+        version = con.execute("PRAGMA data_version").fetchone()[0]
+        if self.versions.get(id(con)) != version:
+            if id(con) in self.versions:
+                self.clear()
+            self.versions[id(con)] = version
+
+    def invalidate(self, *tags):
+        with self.lock:
+            self.generation += 1
+            for key, (_, entry_tags, size) in list(self.entries.items()):
+                if not entry_tags.isdisjoint(tags):
+                    del self.entries[key]
+                    self.rows -= size
+
+    # Pages are dropped when they hold one of the changed books. New books get
+    # the highest ids, so of the id-ordered pages only a short last page and
+    # pages read backwards can gain them.
+    def books_changed(self, book_ids, added=False):
+        book_ids = set(book_ids)
+        with self.lock:
+            self.generation += 1
+            for key, (value, tags, size) in list(self.entries.items()):
+                if PAGES not in tags:
+                    continue
+                if (added and (key[0] == "books_before" or len(value) < key[-1])) or any(book.id in book_ids for book in value):
+                    del self.entries[key]
+                    self.rows -= size
+        self.invalidate(AVAILABLE, TAKEN, SEARCH)
+
+    def clear(self):
+        with self.lock:
+            self.generation += 1
+            self.entries.clear()
+            self.rows = 0
+
+    # For a new database file: forget the entries and the versions seen.
+    def reset(self):
+        with self.lock:
+            self.clear()
+            self.versions.clear()
+
+    def stats(self):
+        with self.lock:
+            return {"entries": len(self.entries), "rows": self.rows, "hits": self.hits, "misses": self.misses}
+
+
+query_cache = QueryCache()
@@ -1,25 +1,23 @@
 import tkinter as tk
 from tkinter import ttk, END
-import sqlite3
-import user_dashboard
-from ttkbootstrap import Style
+import theme
 from tkinter.messagebox import showerror
-import user_dashboard
+import checkout
+from database import repository
+from change_feed import LiveScreen, change_feed
+from autocomplete import AutocompleteCombobox, PrefixIndex
+from background import db_tasks
+from navigation import navigator
 
 
-class RequestBook(tk.Toplevel):
+class RequestBook(LiveScreen, tk.Toplevel):
     def __init__(self,username):
         super().__init__()
 
-        style = Style(theme='united')
-        style.master = self
-        style.configure('Medium.TButton', font=('inconsolata', 18))
+        theme.get_style()
 
         self.username = username
 
-        self.connection = sqlite3.connect("library.db")
-        self.cursor = self.connection.cursor()
-        
         screen_width = self.winfo_screenwidth()
         screen_height = self.winfo_screenheight()
         width = 500
@@ -32,30 +30,61 @@ class RequestBook(tk.Toplevel):
         self.columnconfigure((0 ,1), weight= 1)
         self.rowconfigure((0,1,2,3,4), weight= 1)
 
-        self.books = []
-        self.getting_books()
+        self.books = {}
+        self.load_task = None
         self.book_str = tk.StringVar(value = "Select from here!")
         self.email_str = tk.StringVar(value= "Please enter your e-mail here")
         self.creating_widgets()
         self.packing_widgets()
+        self.getting_books()
         self.email_entry.bind("<Button-1>", lambda event: self.entry_clicked())
+        change_feed.subscribe(self, self.apply_changes)
 
-        self.mainloop()
-
+    # Copies of the listed titles by book id, kept current by the change feed.
+    # The list and its prefix index are built on the database thread.
     def getting_books(self):
-        is_taken = "False"
-        self.cursor.execute("SELECT title FROM book_properties WHERE is_taken = ?", (is_taken,))
-        rows = self.cursor.fetchall()
-        self.books = [row[0] for row in rows]
+        self.book_selector.config(state= "disabled")
+        self.load_task = db_tasks.run(self, self.load_books, self.show_books)
+
+    def load_books(self):
+        books = dict(repository.available_books())
+        return books, PrefixIndex(books.values())
+
+    def show_books(self, loaded):
+        self.load_task = None
+        self.books, index = loaded
+        self.book_selector.config(state= "normal")
+        self.book_selector.set_index(index)
+
+    def reload(self):
+        self.getting_books()
+
+    def forget_books(self, changes):
+        for book_id in changes:
+            title = self.books.pop(book_id, None)
+            if title is not None:
+                self.book_selector.remove_title(title)
+        return list(changes)
+
+    def show_changes(self, book_ids, books):
+        for book in books:
+            if book.id in self.books:
+                continue
+            if not book.is_taken:
+                self.books[book.id] = book.title
+                self.book_selector.add_title(book.title)
+        self.book_selector.narrow()
+
+    def search_titles(self, text, limit):
+        return repository.search_titles(text, False, limit)
 
     def creating_widgets(self):
         self.top_label = ttk.Label(self, text= f"Welcome {self.username}!", font="inconsolata 25")
         self.below_label = ttk.Label(self, text=f"Please select the book you want to request below!", font="inconsolata 15")
-        self.book_selector = ttk.Combobox(self, textvariable= self.book_str)
-        self.book_selector['values'] = self.books
+        self.book_selector = AutocompleteCombobox(self, search= self.search_titles, placeholder= "Select from here!", textvariable= self.book_str)
         self.email_entry = ttk.Entry(self, textvariable= self.email_str)
-        self.button1 = ttk.Button(self, text= "Request!", command= self.request, style= "Medium.TButton")
-        self.previous_menu_button = ttk.Button(self, text= "Previous Menu", command= self.previous_menu, style= "Medium.TButton")
+        self.button1 = ttk.Button(self, text= "Request!", command= self.request, style= "Large.TButton")
+        self.previous_menu_button = ttk.Button(self, text= "Previous Menu", command= self.previous_menu, style= "Large.TButton")
 
     def packing_widgets(self):
         self.top_label.grid(row = 0, column= 0, columnspan= 2)
@@ -71,17 +100,27 @@ class RequestBook(tk.Toplevel):
         elif self.email_str.get() in ["Please enter your e-mail here", "", " "]:
             showerror(message= "Please enter your e-mail accordingly!")
         else:
-            self.cursor.execute("UPDATE book_properties SET is_taken = ?, who_took = ?, email = ? WHERE title = ?", ("True", self.username, self.email_str.get(), self.book_str.get(),))
-            self.connection.commit()
-            showerror(message= "Your Request has been accepted! \n \n You can request only one book per session!")
+            title, email = self.book_str.get(), self.email_str.get()
             self.button1.config(state= "disabled")
+            db_tasks.run(self, lambda: checkout.checkout_title(title, self.username, email), self.requested,
+                         self.request_failed, cancellable= False)
+
+    def requested(self, outcome):
+        result, _ = outcome
+        if result == checkout.CHECKED_OUT:
+            showerror(message= "Your Request has been accepted! \n \n You can request only one book per session!")
             self.email_entry.delete(0, END)
+        else:
+            self.button1.config(state= "normal")
+            showerror(message= "Sorry, this book is no longer available!")
+            self.getting_books()
+
+    def request_failed(self, error):
+        self.button1.config(state= "normal")
+        showerror(message= f"Your request could not be saved: {error}")
 
     def entry_clicked(self):
         self.email_entry.delete(0, END)
 
     def previous_menu(self):
-        self.withdraw() 
-        add_book_window = user_dashboard.userDashboard(self.username)
-        add_book_window.wait_window()
-        self.deiconify()
\ No newline at end of file
+        navigator.back()
\ No newline at end of file
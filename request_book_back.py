@@ -1,24 +1,23 @@
 import tkinter as tk
 from tkinter import ttk
-import sqlite3
-import admin_dashboard
-from ttkbootstrap import Style
+import theme
 from tkinter.messagebox import showerror
+from database import repository
+from change_feed import LiveScreen, change_feed
+from autocomplete import AutocompleteCombobox, PrefixIndex
+from background import db_tasks
+import outbox
+from navigation import navigator
 
 
-class RequestBookBack(tk.Toplevel):
+class RequestBookBack(LiveScreen, tk.Toplevel):
     def __init__(self, username):
         super().__init__()
 
-        style = Style(theme= "united")
-        style.master = self
-        style.configure('Medium.TButton', font = ('inconsolata, 18'))
+        theme.get_style()
 
         self.username = username
 
-        self.connection = sqlite3.connect('library.db')
-        self.cursor = self.connection.cursor()
-
         screen_width = self.winfo_screenwidth()
         screen_height = self.winfo_screenheight()
         width = 500
@@ -31,28 +30,59 @@ class RequestBookBack(tk.Toplevel):
         self.columnconfigure((0,1), weight= 1)
         self.rowconfigure((0,1,2,3), weight= 1)
 
-        self.books = []
+        self.books = {}
+        self.load_task = None
         self.book_str = tk.StringVar(value = "Select from here!")
 
-        self.getting_books()
         self.creating_widgets()
         self.packing_widgets()
+        self.getting_books()
+        change_feed.subscribe(self, self.apply_changes)
 
-        self.mainloop()
-
+    # Copies of the listed titles by book id, kept current by the change feed.
+    # The list and its prefix index are built on the database thread.
     def getting_books(self):
-        is_taken = "True"
-        self.cursor.execute("SELECT title FROM book_properties WHERE is_taken = ?", (is_taken, ))
-        rows = self.cursor.fetchall()
-        self.books = [row[0] for row in rows]
+        self.book_selector.config(state= "disabled")
+        self.load_task = db_tasks.run(self, self.load_books, self.show_books)
+
+    def load_books(self):
+        books = dict(repository.taken_books())
+        return books, PrefixIndex(books.values())
+
+    def show_books(self, loaded):
+        self.load_task = None
+        self.books, index = loaded
+        self.book_selector.config(state= "normal")
+        self.book_selector.set_index(index)
+
+    def reload(self):
+        self.getting_books()
+
+    def forget_books(self, changes):
+        for book_id in changes:
+            title = self.books.pop(book_id, None)
+            if title is not None:
+                self.book_selector.remove_title(title)
+        return list(changes)
+
+    def show_changes(self, book_ids, books):
+        for book in books:
+            if book.id in self.books:
+                continue
+            if book.is_taken:
+                self.books[book.id] = book.title
+                self.book_selector.add_title(book.title)
+        self.book_selector.narrow()
+
+    def search_titles(self, text, limit):
+        return repository.search_titles(text, True, limit)
 
     def creating_widgets(self):
         self.top_label = ttk.Label(self, text= f"Welcome {self.username}!", font="inconsolata 25")
         self.below_label = ttk.Label(self, text= f"Please select the book you want to request back below", font="inconsolata 15")
-        self.book_selector = ttk.Combobox(self, textvariable= self.book_str)
-        self.book_selector['values'] = self.books
-        self.button1 = ttk.Button(self, text= "Send E-Mail!", command= self.request_back, style= "Medium.TButton")
-        self.previous_menu_button = ttk.Button(self, text= "Previous Menu", command= self.previous_menu, style= "Medium.TButton")
+        self.book_selector = AutocompleteCombobox(self, search= self.search_titles, placeholder= "Select from here!", textvariable= self.book_str)
+        self.button1 = ttk.Button(self, text= "Send E-Mail!", command= self.request_back, style= "Large.TButton")
+        self.previous_menu_button = ttk.Button(self, text= "Previous Menu", command= self.previous_menu, style= "Large.TButton")
 
     def packing_widgets(self):
         self.top_label.grid(row = 0, column= 0, columnspan= 2)
@@ -62,14 +92,27 @@ class RequestBookBack(tk.Toplevel):
         self.previous_menu_button.grid(row = 3, column= 1)
 
     def request_back(self):
-        self.cursor.execute("SELECT email FROM book_properties WHERE title = ?", (self.book_str.get(),))
-        e_mail = (self.cursor.fetchall()[0][0])
+        title = self.book_str.get()
+        self.button1.config(state= "disabled")
+        db_tasks.run(self, lambda: self.send_request(title), self.request_sent, self.request_failed, cancellable= False)
+
+    # Runs on the database thread.
+    def send_request(self, title):
+        e_mail = repository.borrower_email(title)
+        if e_mail:
+            outbox.queue_email(e_mail, f"Please return \"{title}\"", f"Hello,\n\nThe library needs \"{title}\" back. Please return it as soon as possible.\n\n{self.username}")
+        return e_mail
+
+    def request_sent(self, e_mail):
+        self.button1.config(state= "normal")
+        if not e_mail:
+            showerror(message= "Please choose a book that has been taken!")
+            return
         showerror(message= f"E-Mail has been sent to: \n \n {e_mail}")
 
-        # There should be a sending e-mail prompt here, but I do not want to risking to expose my gmail app password here :)
+    def request_failed(self, error):
+        self.button1.config(state= "normal")
+        showerror(message= f"The e-mail could not be queued: {error}")
 
     def previous_menu(self):
-        self.withdraw() 
-        add_book_window = admin_dashboard.adminDashboard(self.username)
-        add_book_window.wait_window()
-        self.deiconify()
+        navigator.back()
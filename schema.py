@@ -0,0 +1,413 @@
+import sqlite3
+
+BASE_TABLES = """
+    CREATE TABLE IF NOT EXISTS userdatabase (
+        id INTEGER PRIMARY KEY,
+        name TEXT NOT NULL,
+        password TEXT NOT NULL,
+        isadmin INTEGER NOT NULL DEFAULT 0
+    );
+    CREATE TABLE IF NOT EXISTS book_properties (
+        id INTEGER PRIMARY KEY,
+        image_path TEXT,
+        title TEXT NOT NULL,
+        author TEXT,
+        genre TEXT,
+        language TEXT,
+        page INTEGER,
+        is_taken TEXT NOT NULL DEFAULT 'False',
+        who_took TEXT DEFAULT 'In the Stock!',
+        email TEXT DEFAULT '-'
+    );
+"""
+
+# Column lists of the tables as the app created them before migrations; their
+# rows were addressed by position and book_properties had no id at all.
+LEGACY_COLUMNS = {
+    "userdatabase": ("id", "name", "password", "isadmin"),
+    "book_properties": ("image_path", "title", "author", "genre", "language", "page", "is_taken", "who_took", "email"),
+}
+
+
+# Version 1 creates the base tables. A table left by the pre-migration app
+# (one without an INTEGER PRIMARY KEY id) is renamed aside and copied into
+# the new layout in rowid order, so books get ids in the order they were
+# added; CREATE TABLE IF NOT EXISTS alone would keep the old table.
+def _base_tables(con):
+    legacy = []
+    for table in LEGACY_COLUMNS:
+        columns = {row[1]: row[5] for row in con.execute(f"PRAGMA table_info({table})")}
+        if columns and not columns.get("id"):
+            con.execute(f"ALTER TABLE {table} RENAME TO legacy_{table}")
+            legacy.append(table)
+    for statement in _statements(BASE_TABLES):
+        con.execute(statement)
+    for table in legacy:
+        columns = ", ".join(LEGACY_COLUMNS[table])
+        con.execute(f"INSERT INTO {table} ({columns}) SELECT {columns} FROM legacy_{table} ORDER BY rowid")
+        con.execute(f"DROP TABLE legacy_{table}")
+
+
+# Each migration moves the database from version - 1 to version and is tracked
+# through PRAGMA user_version, so existing library.db files are upgraded in
+# place. Never edit a migration that has shipped; append a new one instead.
+MIGRATIONS = [
+    (1, _base_tables),
+    (2, """
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_userdatabase_name ON userdatabase (name);
+        CREATE INDEX IF NOT EXISTS idx_book_properties_title ON book_properties (title);
+        CREATE INDEX IF NOT EXISTS idx_book_properties_is_taken_title ON book_properties (is_taken, title);
+    """),
+    (3, """
+        CREATE VIRTUAL TABLE IF NOT EXISTS book_search USING fts5 (
+            title, author, genre, language,
+            content = 'book_properties', content_rowid = 'id',
+            tokenize = 'unicode61 remove_diacritics 2'
+        );
+        CREATE TRIGGER IF NOT EXISTS book_search_insert AFTER INSERT ON book_properties BEGIN
+            INSERT INTO book_search (rowid, title, author, genre, language)
+            VALUES (new.id, new.title, new.author, new.genre, new.language);
+        END;
+        CREATE TRIGGER IF NOT EXISTS book_search_delete AFTER DELETE ON book_properties BEGIN
+            INSERT INTO book_search (book_search, rowid, title, author, genre, language)
+            VALUES ('delete', old.id, old.title, old.author, old.genre, old.language);
+        END;
+        CREATE TRIGGER IF NOT EXISTS book_search_update
+        AFTER UPDATE OF title, author, genre, language ON book_properties BEGIN
+            INSERT INTO book_search (book_search, rowid, title, author, genre, language)
+            VALUES ('delete', old.id, old.title, old.author, old.genre, old.language);
+            INSERT INTO book_search (rowid, title, author, genre, language)
+            VALUES (new.id, new.title, new.author, new.genre, new.language);
+        END;
+        INSERT INTO book_search (book_search) VALUES ('rebuild');
+    """),
+    (4, """
+        CREATE TABLE IF NOT EXISTS import_progress (
+            source TEXT PRIMARY KEY,
+            rows_done INTEGER NOT NULL,
+            updated_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
+        );
+    """),
+    (5, """
+        ALTER TABLE book_properties ADD COLUMN row_version INTEGER NOT NULL DEFAULT 0;
+        UPDATE book_properties SET row_version = id;
+        CREATE INDEX IF NOT EXISTS idx_book_properties_row_version ON book_properties (row_version);
+        CREATE TRIGGER IF NOT EXISTS book_properties_version_insert AFTER INSERT ON book_properties BEGIN
+            UPDATE book_properties SET row_version = (SELECT MAX(row_version) FROM book_properties) + 1
+            WHERE id = new.id;
+        END;
+        CREATE TRIGGER IF NOT EXISTS book_properties_version_update AFTER UPDATE ON book_properties
+        WHEN new.row_version = old.row_version BEGIN
+            UPDATE book_properties SET row_version = (SELECT MAX(row_version) FROM book_properties) + 1
+            WHERE id = new.id;
+        END;
+        CREATE TABLE IF NOT EXISTS export_progress (
+            name TEXT PRIMARY KEY,
+            row_version INTEGER NOT NULL,
+            exported_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
+        );
+    """),
+    (6, """
+        CREATE TABLE IF NOT EXISTS outbox (
+            id INTEGER PRIMARY KEY,
+            recipient TEXT NOT NULL,
+            subject TEXT NOT NULL,
+            body TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'pending',
+            attempts INTEGER NOT NULL DEFAULT 0,
+            next_attempt_at REAL NOT NULL DEFAULT 0,
+            last_error TEXT,
+            created_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            sent_at TEXT
+        );
+        CREATE INDEX IF NOT EXISTS idx_outbox_due ON outbox (status, next_attempt_at);
+    """),
+    (7, """
+        CREATE TABLE IF NOT EXISTS loans (
+            id INTEGER PRIMARY KEY,
+            book_id INTEGER NOT NULL REFERENCES book_properties (id),
+            user_id INTEGER REFERENCES userdatabase (id),
+            email TEXT,
+            checked_out_at INTEGER NOT NULL,
+            due_at INTEGER NOT NULL,
+            returned_at INTEGER
+        );
+        -- Partial indexes only hold open loans, so they stay small however
+        -- much loan history piles up.
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_loans_open_book ON loans (book_id) WHERE returned_at IS NULL;
+        CREATE INDEX IF NOT EXISTS idx_loans_open_user ON loans (user_id, due_at) WHERE returned_at IS NULL;
+        CREATE INDEX IF NOT EXISTS idx_loans_open_due ON loans (due_at) WHERE returned_at IS NULL;
+        INSERT INTO loans (book_id, user_id, email, checked_out_at, due_at)
+        SELECT b.id, u.id, b.email, CAST(strftime('%s', 'now') AS INTEGER), CAST(strftime('%s', 'now') AS INTEGER) + 14 * 86400
+        FROM book_properties b LEFT JOIN userdatabase u ON u.name = b.who_took
+        WHERE b.is_taken = 'True';
+    """),
+    (8, """
+        CREATE TABLE IF NOT EXISTS book_changes (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            book_id INTEGER NOT NULL,
+            op TEXT NOT NULL,
+            changed_at INTEGER NOT NULL DEFAULT (CAST(strftime('%s', 'now') AS INTEGER))
+        );
+        CREATE TRIGGER IF NOT EXISTS book_changes_insert AFTER INSERT ON book_properties BEGIN
+            INSERT INTO book_changes (book_id, op) VALUES (new.id, 'upsert');
+        END;
+        -- The row_version trigger updates the row again; only the outer update,
+        -- where the version has not been bumped yet, is logged.
+        CREATE TRIGGER IF NOT EXISTS book_changes_update AFTER UPDATE ON book_properties
+        WHEN new.row_version = old.row_version BEGIN
+            INSERT INTO book_changes (book_id, op) VALUES (new.id, 'upsert');
+        END;
+        CREATE TRIGGER IF NOT EXISTS book_changes_delete AFTER DELETE ON book_properties BEGIN
+            INSERT INTO book_changes (book_id, op) VALUES (old.id, 'delete');
+        END;
+    """),
+    (9, """
+        -- Compact layout: availability is 0/1, a copy in stock has NULL
+        -- who_took and email, and author, genre and language are stored once
+        -- in lookup tables. book_properties becomes a view with the old
+        -- columns and values so older scripts keep reading and writing it.
+        CREATE TABLE IF NOT EXISTS authors (id INTEGER PRIMARY KEY, name TEXT NOT NULL UNIQUE);
+        CREATE TABLE IF NOT EXISTS genres (id INTEGER PRIMARY KEY, name TEXT NOT NULL UNIQUE);
+        CREATE TABLE IF NOT EXISTS languages (id INTEGER PRIMARY KEY, name TEXT NOT NULL UNIQUE);
+        INSERT OR IGNORE INTO authors (name) SELECT DISTINCT author FROM book_properties WHERE author IS NOT NULL;
+        INSERT OR IGNORE INTO genres (name) SELECT DISTINCT genre FROM book_properties WHERE genre IS NOT NULL;
+        INSERT OR IGNORE INTO languages (name) SELECT DISTINCT language FROM book_properties WHERE language IS NOT NULL;
+        CREATE TABLE books (
+            id INTEGER PRIMARY KEY,
+            image_path TEXT,
+            title TEXT NOT NULL,
+            author_id INTEGER REFERENCES authors (id),
+            genre_id INTEGER REFERENCES genres (id),
+            language_id INTEGER REFERENCES languages (id),
+            page INTEGER,
+            is_taken INTEGER NOT NULL DEFAULT 0,
+            who_took TEXT,
+            email TEXT,
+            row_version INTEGER NOT NULL DEFAULT 0
+        );
+        INSERT INTO books (id, image_path, title, author_id, genre_id, language_id, page, is_taken, who_took, email, row_version)
+        SELECT b.id, b.image_path, b.title, a.id, g.id, l.id, b.page, b.is_taken = 'True',
+               CASE WHEN b.is_taken = 'True' THEN NULLIF(b.who_took, 'In the Stock!') END,
+               CASE WHEN b.is_taken = 'True' THEN NULLIF(b.email, '-') END,
+               b.row_version
+        FROM book_properties b
+        LEFT JOIN authors a ON a.name = b.author
+        LEFT JOIN genres g ON g.name = b.genre
+        LEFT JOIN languages l ON l.name = b.language;
+        -- loans referenced book_properties, so it is rebuilt to reference books.
+        CREATE TABLE loans_new (
+            id INTEGER PRIMARY KEY,
+            book_id INTEGER NOT NULL REFERENCES books (id),
+            user_id INTEGER REFERENCES userdatabase (id),
+            email TEXT,
+            checked_out_at INTEGER NOT NULL,
+            due_at INTEGER NOT NULL,
+            returned_at INTEGER
+        );
+        INSERT INTO loans_new SELECT id, book_id, user_id, email, checked_out_at, due_at, returned_at FROM loans;
+        DROP TABLE loans;
+        DROP TABLE book_properties;
+        ALTER TABLE loans_new RENAME TO loans;
+        CREATE UNIQUE INDEX idx_loans_open_book ON loans (book_id) WHERE returned_at IS NULL;
+        CREATE INDEX idx_loans_open_user ON loans (user_id, due_at) WHERE returned_at IS NULL;
+        CREATE INDEX idx_loans_open_due ON loans (due_at) WHERE returned_at IS NULL;
+        CREATE INDEX idx_books_title ON books (title);
+        CREATE INDEX idx_books_is_taken_title ON books (is_taken, title);
+        CREATE INDEX idx_books_row_version ON books (row_version);
+
+        CREATE VIEW book_properties AS
+        SELECT b.id, b.image_path, b.title, a.name AS author, g.name AS genre, l.name AS language, b.page,
+               CASE WHEN b.is_taken THEN 'True' ELSE 'False' END AS is_taken,
+               COALESCE(b.who_took, 'In the Stock!') AS who_took, COALESCE(b.email, '-') AS email,
+               b.row_version
+        FROM books b
+        LEFT JOIN authors a ON a.id = b.author_id
+        LEFT JOIN genres g ON g.id = b.genre_id
+        LEFT JOIN languages l ON l.id = b.language_id;
+        CREATE TRIGGER book_properties_insert INSTEAD OF INSERT ON book_properties BEGIN
+            INSERT OR IGNORE INTO authors (name) SELECT new.author WHERE new.author IS NOT NULL;
+            INSERT OR IGNORE INTO genres (name) SELECT new.genre WHERE new.genre IS NOT NULL;
+            INSERT OR IGNORE INTO languages (name) SELECT new.language WHERE new.language IS NOT NULL;
+            INSERT INTO books (id, image_path, title, author_id, genre_id, language_id, page, is_taken, who_took, email)
+            VALUES (new.id, new.image_path, new.title,
+                    (SELECT id FROM authors WHERE name = new.author),
+                    (SELECT id FROM genres WHERE name = new.genre),
+                    (SELECT id FROM languages WHERE name = new.language),
+                    new.page, COALESCE(new.is_taken, 'False') = 'True',
+                    CASE WHEN new.is_taken = 'True' THEN NULLIF(new.who_took, 'In the Stock!') END,
+                    CASE WHEN new.is_taken = 'True' THEN NULLIF(new.email, '-') END);
+        END;
+        CREATE TRIGGER book_properties_update INSTEAD OF UPDATE ON book_properties BEGIN
+            INSERT OR IGNORE INTO authors (name) SELECT new.author WHERE new.author IS NOT NULL;
+            INSERT OR IGNORE INTO genres (name) SELECT new.genre WHERE new.genre IS NOT NULL;
+            INSERT OR IGNORE INTO languages (name) SELECT new.language WHERE new.language IS NOT NULL;
+            UPDATE books SET image_path = new.image_path, title = new.title,
+                author_id = (SELECT id FROM authors WHERE name = new.author),
+                genre_id = (SELECT id FROM genres WHERE name = new.genre),
+                language_id = (SELECT id FROM languages WHERE name = new.language),
+                page = new.page, is_taken = new.is_taken = 'True',
+                who_took = CASE WHEN new.is_taken = 'True' THEN NULLIF(new.who_took, 'In the Stock!') END,
+                email = CASE WHEN new.is_taken = 'True' THEN NULLIF(new.email, '-') END
+            WHERE id = old.id;
+        END;
+        CREATE TRIGGER book_properties_delete INSTEAD OF DELETE ON book_properties BEGIN
+            DELETE FROM books WHERE id = old.id;
+        END;
+
+        -- The search index keeps the view as its content table: it has the
+        -- same rowids and column names as the old table, so the index stays
+        -- valid. Its triggers move to books.
+        CREATE TRIGGER book_search_insert AFTER INSERT ON books BEGIN
+            INSERT INTO book_search (rowid, title, author, genre, language)
+            VALUES (new.id, new.title,
+                    (SELECT name FROM authors WHERE id = new.author_id),
+                    (SELECT name FROM genres WHERE id = new.genre_id),
+                    (SELECT name FROM languages WHERE id = new.language_id));
+        END;
+        CREATE TRIGGER book_search_delete AFTER DELETE ON books BEGIN
+            INSERT INTO book_search (book_search, rowid, title, author, genre, language)
+            VALUES ('delete', old.id, old.title,
+                    (SELECT name FROM authors WHERE id = old.author_id),
+                    (SELECT name FROM genres WHERE id = old.genre_id),
+                    (SELECT name FROM languages WHERE id = old.language_id));
+        END;
+        CREATE TRIGGER book_search_update
+        AFTER UPDATE OF title, author_id, genre_id, language_id ON books BEGIN
+            INSERT INTO book_search (book_search, rowid, title, author, genre, language)
+            VALUES ('delete', old.id, old.title,
+                    (SELECT name FROM authors WHERE id = old.author_id),
+                    (SELECT name FROM genres WHERE id = old.genre_id),
+                    (SELECT name FROM languages WHERE id = old.language_id));
+            INSERT INTO book_search (rowid, title, author, genre, language)
+            VALUES (new.id, new.title,
+                    (SELECT name FROM authors WHERE id = new.author_id),
+                    (SELECT name FROM genres WHERE id = new.genre_id),
+                    (SELECT name FROM languages WHERE id = new.language_id));
+        END;
+        CREATE TRIGGER books_version_insert AFTER INSERT ON books BEGIN
+            UPDATE books SET row_version = (SELECT MAX(row_version) FROM books) + 1 WHERE id = new.id;
+        END;
+        CREATE TRIGGER books_version_update AFTER UPDATE ON books
+        WHEN new.row_version = old.row_version BEGIN
+            UPDATE books SET row_version = (SELECT MAX(row_version) FROM books) + 1 WHERE id = new.id;
+        END;
+        CREATE TRIGGER book_changes_insert AFTER INSERT ON books BEGIN
+            INSERT INTO book_changes (book_id, op) VALUES (new.id, 'upsert');
+        END;
+        CREATE TRIGGER book_changes_update AFTER UPDATE ON books
+        WHEN new.row_version = old.row_version BEGIN
+            INSERT INTO book_changes (book_id, op) VALUES (new.id, 'upsert');
+        END;
+        CREATE TRIGGER book_changes_delete AFTER DELETE ON books BEGIN
+            INSERT INTO book_changes (book_id, op) VALUES (old.id, 'delete');
+        END;
+    """),
+    (10, """
+        -- Sorting and filtering the catalog by column. Sorts read (value, id)
+        -- ranges, which every index has since SQLite appends the rowid. The
+        -- lookup id indexes also serve sorting by name: the lookup table's
+        -- name index is walked and joined to books. The shelf index covers
+        -- the common "language, genre, in stock, page count" filter.
+        CREATE INDEX IF NOT EXISTS idx_books_author ON books (author_id);
+        CREATE INDEX IF NOT EXISTS idx_books_genre ON books (genre_id);
+        CREATE INDEX IF NOT EXISTS idx_books_language ON books (language_id);
+        CREATE INDEX IF NOT EXISTS idx_books_page ON books (page);
+        CREATE INDEX IF NOT EXISTS idx_books_who_took ON books (who_took);
+        CREATE INDEX IF NOT EXISTS idx_books_email ON books (email);
+        CREATE INDEX IF NOT EXISTS idx_books_shelf ON books (language_id, genre_id, is_taken, page);
+    """),
+    (11, """
+        -- Prefix indexes for two and three letter prefixes, so the short
+        -- prefix terms of search-as-you-type read one index range instead of
+        -- merging every token that starts with them. The triggers on books
+        -- write to the table by name and need no change.
+        DROP TABLE book_search;
+        CREATE VIRTUAL TABLE book_search USING fts5 (
+            title, author, genre, language,
+            content = 'book_properties', content_rowid = 'id',
+            tokenize = 'unicode61 remove_diacritics 2',
+            prefix = '2 3'
+        );
+        INSERT INTO book_search (book_search) VALUES ('rebuild');
+    """),
+    (12, """
+        -- Legacy writes of is_taken through the view open and close loans the
+        -- way checkout.py does, so the open loan index cannot go stale. Loans
+        -- already left open on books back in stock are closed here. 14 days
+        -- is checkout.LOAN_DAYS.
+        DROP TRIGGER book_properties_update;
+        CREATE TRIGGER book_properties_update INSTEAD OF UPDATE ON book_properties BEGIN
+            INSERT OR IGNORE INTO authors (name) SELECT new.author WHERE new.author IS NOT NULL;
+            INSERT OR IGNORE INTO genres (name) SELECT new.genre WHERE new.genre IS NOT NULL;
+            INSERT OR IGNORE INTO languages (name) SELECT new.language WHERE new.language IS NOT NULL;
+            UPDATE loans SET returned_at = CAST(strftime('%s', 'now') AS INTEGER)
+            WHERE book_id = old.id AND returned_at IS NULL
+              AND old.is_taken = 'True' AND new.is_taken IS NOT 'True';
+            INSERT INTO loans (book_id, user_id, email, checked_out_at, due_at)
+            SELECT old.id, (SELECT id FROM userdatabase WHERE name = new.who_took), NULLIF(new.email, '-'),
+                   CAST(strftime('%s', 'now') AS INTEGER), CAST(strftime('%s', 'now') AS INTEGER) + 14 * 86400
+            WHERE old.is_taken = 'False' AND new.is_taken = 'True';
+            UPDATE books SET image_path = new.image_path, title = new.title,
+                author_id = (SELECT id FROM authors WHERE name = new.author),
+                genre_id = (SELECT id FROM genres WHERE name = new.genre),
+                language_id = (SELECT id FROM languages WHERE name = new.language),
+                page = new.page, is_taken = new.is_taken = 'True',
+                who_took = CASE WHEN new.is_taken = 'True' THEN NULLIF(new.who_took, 'In the Stock!') END,
+                email = CASE WHEN new.is_taken = 'True' THEN NULLIF(new.email, '-') END
+            WHERE id = old.id;
+        END;
+        UPDATE loans SET returned_at = CAST(strftime('%s', 'now') AS INTEGER)
+        WHERE returned_at IS NULL AND book_id IN (SELECT id FROM books WHERE is_taken = 0);
+    """),
+    (13, """
+        -- Without statistics SQLite takes every equality as selective, so a
+        -- sorted page filtered by language, genre and availability walked the
+        -- (is_taken, title) index through most of the catalog. Imports refresh
+        -- the statistics as the catalog grows.
+        ANALYZE;
+    """),
+]
+
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+
+def current_version(con):
+    return con.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(con, target=SCHEMA_VERSION):
+    if current_version(con) >= target:
+        return
+    for version, script in MIGRATIONS:
+        if version > target:
+            break
+        # BEGIN IMMEDIATE takes the write lock before re-reading the version so
+        # two terminals starting at the same time do not apply a step twice.
+        con.execute("BEGIN IMMEDIATE")
+        try:
+            if current_version(con) >= version:
+                con.execute("ROLLBACK")
+                continue
+            if callable(script):
+                script(con)
+            else:
+                for statement in _statements(script):
+                    con.execute(statement)
+            con.execute(f"PRAGMA user_version = {version}")
+            con.execute("COMMIT")
+        except sqlite3.Error:
+            con.execute("ROLLBACK")
+            raise
+
+
+def _statements(script):
+    statement = ""
+    for line in script.splitlines(keepends=True):
+        statement += line
+        if sqlite3.complete_statement(statement):
+            if statement.strip():
+                yield statement.strip()
+            statement = ""
+    if statement.strip():
+        yield statement.strip()
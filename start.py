@@ -1,16 +1,38 @@
-import login_screen
+import time
+started = time.perf_counter()
+
+import sys
 import tkinter as tk
-from tkinter import ttk, END
-from ttkbootstrap import Style
+from profiling import profiler
+from navigation import navigator
+
+OUTBOX_DELAY_MS = 2000
+
+if "--profile" in sys.argv:
+    profiler.enable(sys.argv[sys.argv.index("--profile") + 1])
 
 class start_menu(tk.Tk):
     def __init__(self):
         super().__init__()
 
-        self.withdraw() 
-        add_book_window = login_screen.LoginScreen()
-        add_book_window.wait_window()
-        self.deiconify()
+        self.withdraw()
+        # Used by startup_report.py: quit as soon as the login window is drawn.
+        if "--exit-after-login" in sys.argv:
+            self.after_idle(self.report_startup)
+        else:
+            self.after(OUTBOX_DELAY_MS, self.start_outbox)
+        navigator.start(self, "login")
+
+    # Flush request-back e-mails queued in earlier sessions, once the login
+    # window is up so it does not delay startup.
+    def start_outbox(self):
+        import outbox
+        outbox.ensure_dispatcher()
+
+    def report_startup(self):
+        navigator.current.update_idletasks()
+        print(f"login window ready: {(time.perf_counter() - started) * 1000:.1f} ms", file=sys.stderr)
+        self.destroy()
 
 
-start_menu()
\ No newline at end of file
+start_menu()
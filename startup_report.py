@@ -0,0 +1,64 @@
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import time
+
+from navigation import SCREENS
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+IMPORT_LINE = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+READY_LINE = re.compile(r"login window ready: ([\d.]+) ms")
+SCREEN_MODULES = {module for module, _ in SCREENS.values()}
+
+
+# Starts the app under -X importtime, waits for the login window and reports
+# the cold start time and the slowest imports as JSON.
+def run_once():
+    began = time.perf_counter()
+    result = subprocess.run([sys.executable, "-X", "importtime", "start.py", "--exit-after-login"],
+                            cwd=HERE, capture_output=True, text=True)
+    process_ms = (time.perf_counter() - began) * 1000
+    ready = READY_LINE.search(result.stderr)
+    if result.returncode != 0 or ready is None:
+        raise SystemExit(f"start.py did not reach the login window:\n{result.stderr[-2000:]}")
+    imports = []
+    for match in IMPORT_LINE.finditer(result.stderr):
+        imports.append({
+            "module": match.group(4),
+            "self_us": int(match.group(1)),
+            "cumulative_us": int(match.group(2)),
+            "depth": len(match.group(3)) // 2,
+        })
+    return {"login_ms": float(ready.group(1)), "process_ms": process_ms, "imports": imports}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure cold start time to the login window.")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15, help="number of slowest imports to list")
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    args = parser.parse_args()
+
+    runs = [run_once() for _ in range(args.runs)]
+    last = runs[-1]["imports"]
+    report = {
+        "runs": args.runs,
+        "login_ms_median": statistics.median(run["login_ms"] for run in runs),
+        "process_ms_median": statistics.median(run["process_ms"] for run in runs),
+        "modules_imported": len(last),
+        "screen_modules_imported": sorted({entry["module"] for entry in last if entry["depth"] == 0 and entry["module"] in SCREEN_MODULES}),
+        "slowest_imports": sorted(last, key=lambda entry: entry["cumulative_us"], reverse=True)[:args.top],
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as file:
+            file.write(text)
+    else:
+        print(text)
+
+if __name__ == "__main__":
+    main()
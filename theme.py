@@ -0,0 +1,18 @@
+from ttkbootstrap import Style
+
+THEME = "united"
+
+_style = None
+
+
+# ttkbootstrap's Style is process wide, so it is built and configured once and
+# every screen refers to the named button styles below.
+def get_style():
+    global _style
+    if _style is None:
+        _style = Style(theme=THEME)
+        _style.configure('Small.TButton', font=('inconsolata', 13))
+        _style.configure('Medium.TButton', font=('inconsolata', 15))
+        _style.configure('Large.TButton', font=('inconsolata', 18))
+        _style.configure('Custom.TRadiobutton', font=('inconsolata', 13))
+    return _style
@@ -0,0 +1,88 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+from PIL import Image, ImageTk
+
+from background import image_tasks
+
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".thumbnail_cache")
+MEMORY_BUDGET = 32 * 1024 * 1024
+
+
+def content_hash(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+# Decoding and resizing happen on the image worker threads and the result is
+# written to a disk cache keyed by content hash and size. Only the PhotoImage
+# creation, which Tk requires, runs on the Tk thread, and those images are kept
+# in an LRU bounded by an estimate of their pixel memory.
+class ThumbnailService:
+    def __init__(self, cache_dir=CACHE_DIR, memory_budget=MEMORY_BUDGET):
+        self.cache_dir = cache_dir
+        self.memory_budget = memory_budget
+        self.photos = OrderedDict()
+        self.photo_bytes = 0
+        self.hashes = {}
+        self.hashes_lock = threading.Lock()
+
+    def request(self, widget, path, size, callback):
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return False
+        key = (os.path.abspath(path), stat.st_mtime_ns, stat.st_size, tuple(size))
+        photo = self.photos.get(key)
+        if photo is not None:
+            self.photos.move_to_end(key)
+            callback(photo)
+            return True
+        # Not cancelled when the screen is left: the image is still wanted
+        # when the screen comes back, and unreadable files are skipped.
+        image_tasks.run(widget, lambda: self.thumbnail(key),
+                        lambda image: callback(self.remember(key, ImageTk.PhotoImage(image))),
+                        failed=lambda error: None, cancellable=False)
+        return True
+
+    def thumbnail(self, key):
+        path, mtime, file_size, size = key
+        with self.hashes_lock:
+            digest = self.hashes.get(key[:3])
+        if digest is None:
+            digest = content_hash(path)
+            with self.hashes_lock:
+                self.hashes[key[:3]] = digest
+        cached = os.path.join(self.cache_dir, digest[:2], f"{digest}_{size[0]}x{size[1]}.png")
+        if os.path.exists(cached):
+            with Image.open(cached) as image:
+                image.load()
+                return image
+        with Image.open(path) as original:
+            image = original.convert("RGBA").resize(size, Image.LANCZOS)
+        os.makedirs(os.path.dirname(cached), exist_ok=True)
+        partial = f"{cached}.{threading.get_ident()}.tmp"
+        image.save(partial, format="PNG")
+        os.replace(partial, cached)
+        return image
+
+    # Overlapping requests for the same image share the first photo, so it is
+    # counted against the budget once.
+    def remember(self, key, photo):
+        if key in self.photos:
+            self.photos.move_to_end(key)
+            return self.photos[key]
+        self.photos[key] = photo
+        self.photo_bytes += photo.width() * photo.height() * 4
+        while self.photo_bytes > self.memory_budget and len(self.photos) > 1:
+            _, evicted = self.photos.popitem(last=False)
+            self.photo_bytes -= evicted.width() * evicted.height() * 4
+        return photo
+
+
+thumbnail_service = ThumbnailService()
@@ -1,21 +1,15 @@
 import tkinter as tk
 from tkinter import ttk, END
-from ttkbootstrap import Style
-import sqlite3
+import theme
 from tkinter.messagebox import showerror, showinfo
 from datetime import datetime
-import all_books
-import login_screen
-import request_book
-import my_books
+from navigation import navigator
 
 class userDashboard(tk.Toplevel):
     def __init__(self, username):
         super().__init__()
 
-        style = Style(theme='united')
-        style.master = self
-        style.configure('Medium.TButton', font=('inconsolata', 18))
+        theme.get_style()
 
         today = datetime.now()
         self.formatted_date = today.strftime("%B %-d, %Y.")
@@ -38,16 +32,14 @@ class userDashboard(tk.Toplevel):
         self.creating_widgets()
         self.packing_widgets()
 
-        self.mainloop()
-
     def creating_widgets(self):
         self.top_label = ttk.Label(self, text=f"Welcome {self.username}!", font="inconsolata 25")
         self.below_label = ttk.Label(self, text=f"It is currently: {self.formatted_date}", font="inconsolata 14")
 
-        self.add_book_button = ttk.Button(self, text="All Books in the Library", style="Medium.TButton", command= self.all_books)
-        self.request_book_button = ttk.Button(self, text="Request A Book", style="Medium.TButton", command= self.request_book)
-        self.all_book_button = ttk.Button(self, text="My Books", style="Medium.TButton", command= self.my_books)
-        self.go_back_button = ttk.Button(self, text= "Log Out", style="Medium.TButton", command= self.previous_menu)
+        self.add_book_button = ttk.Button(self, text="All Books in the Library", style="Large.TButton", command= self.all_books)
+        self.request_book_button = ttk.Button(self, text="Request A Book", style="Large.TButton", command= self.request_book)
+        self.all_book_button = ttk.Button(self, text="My Books", style="Large.TButton", command= self.my_books)
+        self.go_back_button = ttk.Button(self, text= "Log Out", style="Large.TButton", command= self.previous_menu)
 
     def packing_widgets(self):
         self.top_label.grid(row=0, column=0)
@@ -58,25 +50,13 @@ class userDashboard(tk.Toplevel):
         self.go_back_button.grid(row=5, column=0, sticky="nsew", padx=10, pady=10)
 
     def all_books(self):
-        self.withdraw() 
-        add_book_window = all_books.AllBooks("user", self.username)
-        add_book_window.wait_window()
-        self.deiconify()
+        navigator.push("all_books", "user", self.username)
 
     def request_book(self):
-        self.withdraw() 
-        add_book_window = request_book.RequestBook(self.username)
-        add_book_window.wait_window()
-        self.deiconify()
+        navigator.push("request_book", self.username)
 
     def my_books(self):
-        self.withdraw() 
-        add_book_window = my_books.MyBooks(self.username)
-        add_book_window.wait_window()
-        self.deiconify()
+        navigator.push("my_books", self.username)
 
     def previous_menu(self):
-        self.withdraw() 
-        add_book_window = login_screen.LoginScreen()
-        add_book_window.wait_window()
-        self.deiconify()
+        navigator.log_out()